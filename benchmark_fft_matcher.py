@@ -0,0 +1,71 @@
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from fft_matcher import FFTMatcher
+
+TEMPLATE_PATHS = [
+    "fig/Home_feature.png",
+    "fig/clickScreen.png",
+    "fig/clickgame.png",
+    "fig/fgoLogo.png",
+    "fig/gongGao.png",
+    "fig/shiFouTuiChu.png",
+]
+
+
+def benchmark_fft_matcher(screenshot_path="screenshot.png", rounds=5, tolerance=1e-3):
+    """对比逐模板matchTemplate循环与频域批量匹配的耗时和结果"""
+    frame = cv2.imread(screenshot_path)
+    if frame is None:
+        print(f"无法加载截图: {screenshot_path}")
+        return False
+    templates = {path: cv2.imread(path) for path in TEMPLATE_PATHS}
+    matcher = FFTMatcher(TEMPLATE_PATHS)
+
+    print(f"截图尺寸: {frame.shape[1]}x{frame.shape[0]}，模板数量: {len(TEMPLATE_PATHS)}，轮数: {rounds}")
+    # 前两帧分别测出各模板直接匹配的耗时和频域方法的开销，之后按实测耗时选择方法
+    for _ in range(2):
+        matcher.match_all(frame)
+    print(f"频域共摊开销(整帧DFT+积分图): {matcher.shared_cost[frame.shape] * 1000:.1f} ms，"
+          f"每个模板: {matcher.fft_cost[frame.shape] * 1000:.1f} ms")
+    for path in TEMPLATE_PATHS:
+        height, width = templates[path].shape[:2]
+        print(f"  {path}: {width}x{height}，直接匹配 {matcher.direct_cost[(path, frame.shape)] * 1000:.1f} ms")
+    for count in range(1, len(TEMPLATE_PATHS) + 1):
+        fft_paths = matcher.plan(frame.shape, TEMPLATE_PATHS[:count])
+        print(f"  同一帧{count}个模板时走频域: {len(fft_paths)}个")
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        baseline = {path: cv2.matchTemplate(frame, target, cv2.TM_CCOEFF_NORMED)
+                    for path, target in templates.items()}
+    loop_time = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        batched = matcher.match_all(frame)
+    batch_time = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        matcher.match_all(frame, TEMPLATE_PATHS[:1])
+    single_time = (time.perf_counter() - start) / rounds
+
+    print(f"逐模板matchTemplate: {loop_time * 1000:.1f} ms/帧")
+    print(f"批量匹配（按耗时选择方法）: {batch_time * 1000:.1f} ms/帧")
+    print(f"单模板调用: {single_time * 1000:.1f} ms")
+
+    passed = True
+    for path in TEMPLATE_PATHS:
+        diff = float(np.max(np.abs(baseline[path] - batched[path])))
+        status = "通过" if diff <= tolerance else "超出误差"
+        passed = passed and diff <= tolerance
+        print(f"  {path}: 最大误差 {diff:.2e} {status}")
+    return passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if benchmark_fft_matcher() else 1)
@@ -0,0 +1,56 @@
+import subprocess
+import sys
+import time
+
+from config import load_config
+from input_batch import InputSession
+
+# 无副作用的按键，只用于计时
+BENCH_KEYCODE = "KEYCODE_UNKNOWN"
+
+
+def benchmark_input(adb_path=None, device_address=None, count=20):
+    """对比每个事件单独启动adb进程与常驻shell批量发送的吞吐量（事件/秒）
+
+    adb_path、device_address未指定时取自config.json当前配置档
+    """
+    if adb_path is None or device_address is None:
+        emulator = load_config().emulator
+        adb_path = adb_path or emulator.adb_path
+        device_address = device_address or emulator.device_address
+    print(f"设备: {device_address}，事件数: {count}")
+
+    start = time.perf_counter()
+    for _ in range(count):
+        subprocess.run([adb_path, "-s", device_address, "shell", f"input keyevent {BENCH_KEYCODE}"],
+                       capture_output=True, timeout=30)
+    per_process = time.perf_counter() - start
+
+    session = InputSession(adb_path, device_address)
+    try:
+        # 预先建立shell，不计入批量发送的耗时
+        session.keyevent(BENCH_KEYCODE)
+        session.flush()
+
+        start = time.perf_counter()
+        for _ in range(count):
+            session.keyevent(BENCH_KEYCODE)
+            session.flush()
+        per_event_flush = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(count):
+            session.keyevent(BENCH_KEYCODE)
+        ok = session.flush()
+        batched = time.perf_counter() - start
+    finally:
+        session.close()
+
+    print(f"每个事件单独adb进程: {count / per_process:.1f} 事件/秒")
+    print(f"常驻shell逐个发送: {count / per_event_flush:.1f} 事件/秒")
+    print(f"常驻shell整批发送: {count / batched:.1f} 事件/秒")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if benchmark_input(*sys.argv[1:3]) else 1)
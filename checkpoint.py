@@ -0,0 +1,81 @@
+import datetime
+import json
+import os
+
+# 签到流程的阶段名称和顺序，签到脚本的STAGES、定时运行脚本的参数校验和日志索引都以此为准
+STAGE_NAMES = ["launch_game", "click_game", "click_screen", "close_notice", "exit_game"]
+
+
+class RunCheckpoint:
+    """签到进度检查点
+
+    以小JSON文件记录当天已完成的阶段，模拟器恢复或定时任务重试后
+    从第一个未完成的阶段继续，而不是从头重放整个流程。
+    日期变化后自动清空，保证每天重新签到。
+    """
+
+    def __init__(self, path="checkpoint.json"):
+        """
+        :param path: 检查点文件路径
+        """
+        self.path = path
+        self.day = self._today()
+        self.completed = []
+        self.load()
+
+    @staticmethod
+    def _today():
+        return datetime.date.today().isoformat()
+
+    def load(self):
+        """读取检查点，文件不存在、损坏或不是今天的记录时视为空"""
+        self.day = self._today()
+        self.completed = []
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取检查点失败，将从头运行: {e}")
+            return
+        if data.get("day") == self.day:
+            self.completed = list(data.get("completed", []))
+
+    def save(self):
+        """写入检查点（先写临时文件再替换，避免中途断电留下半个文件）"""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"day": self.day, "completed": self.completed}, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def _roll_day(self):
+        """跨过零点时丢弃前一天的进度"""
+        today = self._today()
+        if self.day != today:
+            self.day = today
+            self.completed = []
+
+    def is_done(self, stage):
+        """判断今天是否已完成某阶段"""
+        self._roll_day()
+        return stage in self.completed
+
+    def mark_done(self, stage):
+        """记录阶段完成并立即落盘"""
+        self._roll_day()
+        if stage not in self.completed:
+            self.completed.append(stage)
+        self.save()
+
+    def discard(self, stages):
+        """撤销若干阶段的完成记录（例如模拟器重启后游戏内进度失效）"""
+        self.completed = [stage for stage in self.completed if stage not in stages]
+        self.save()
+
+    def first_unfinished(self, stages):
+        """按顺序返回第一个未完成的阶段，全部完成时返回None"""
+        for stage in stages:
+            if not self.is_done(stage):
+                return stage
+        return None
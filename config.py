@@ -0,0 +1,296 @@
+import json
+import math
+import os
+import re
+import typing
+from dataclasses import dataclass, field, fields, is_dataclass
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+
+class ConfigError(ValueError):
+    """配置文件内容不合法"""
+
+
+@dataclass
+class EmulatorConfig:
+    """模拟器和ADB"""
+    adb_path: str = "D:/APP/LDPlayer9/adb.exe"
+    ldplayer_path: str = r"D:\APP\LDPlayer9\dnplayer.exe"
+    device_name: str = "LDPlayer"
+    device_address: str = field(default="127.0.0.1:5555", metadata={"pattern": r"^[\w.-]+:\d+$"})
+    restart_wait: float = field(default=20, metadata={"min": 0})  # 启动模拟器后的等待时间（秒）
+
+
+@dataclass
+class CaptureConfig:
+    """截图方式：pull为设备端保存再拉取，exec_out直接通过adb exec-out读取PNG"""
+    backend: str = field(default="pull", metadata={"choices": ("pull", "exec_out")})
+    screenshot_path: str = "screenshot.png"
+
+
+@dataclass
+class MatchingConfig:
+    """模板匹配：engine为direct（逐个匹配）、fft（频域批量）或pool（多进程）"""
+    engine: str = field(default="direct", metadata={"choices": ("direct", "fft", "pool")})
+    threshold: float = field(default=0.8, metadata={"min": 0, "max": 1})
+    # 按模板覆盖阈值，键为模板路径（相对路径按配置文件所在目录解析，必须存在）
+    thresholds: typing.Dict[str, float] = field(default_factory=dict, metadata={"min": 0, "max": 1})
+    prefilter: bool = True
+    prefilter_min_coverage: float = field(default=0.5, metadata={"min": 0, "max": 1})
+    pool_processes: typing.Optional[int] = field(default=None, metadata={"min": 1})
+
+    def threshold_for(self, target_image_path):
+        """取某个模板的匹配阈值"""
+        return self.thresholds.get(target_image_path, self.threshold)
+
+
+@dataclass
+class TimeoutConfig:
+    """轮询间隔与超时预算（秒）"""
+    stage: float = field(default=120, metadata={"min": 1})
+    game_launch: float = field(default=40, metadata={"min": 0})
+    poll_interval: float = field(default=0.5, metadata={"min": 0})
+    adb_command: float = field(default=30, metadata={"min": 1})
+    device_wait: float = field(default=15, metadata={"min": 0})
+    max_recoveries: int = field(default=3, metadata={"min": 0})
+
+
+@dataclass
+class WatchdogConfig:
+    """后台设备健康检查"""
+    enabled: bool = True
+    interval: float = field(default=5, metadata={"min": 0.5})
+
+
+@dataclass
+class InputConfig:
+    """输入注入"""
+    use_sendevent: bool = False
+
+
+@dataclass
+class RunnerConfig:
+    """定时运行脚本"""
+    python_path: str = r"D:\APP\conda\python.exe"
+    target_script: str = r"E:\Code\pythonProject\pythonProject\签到脚本\签到脚本V1.py"
+    log_path: str = r"E:\Code\pythonProject\pythonProject\签到脚本\log.txt"
+    schedule: str = field(default="04:15", metadata={"pattern": r"^([01]\d|2[0-3]):[0-5]\d$"})  # 每天运行时间
+    script_timeout: float = field(default=3600, metadata={"min": 1})
+
+    @property
+    def schedule_time(self):
+        """(时, 分)"""
+        hour, minute = self.schedule.split(":")
+        return int(hour), int(minute)
+
+
+@dataclass
+class Config:
+    emulator: EmulatorConfig = field(default_factory=EmulatorConfig)
+    capture: CaptureConfig = field(default_factory=CaptureConfig)
+    matching: MatchingConfig = field(default_factory=MatchingConfig)
+    timeouts: TimeoutConfig = field(default_factory=TimeoutConfig)
+    watchdog: WatchdogConfig = field(default_factory=WatchdogConfig)
+    input: InputConfig = field(default_factory=InputConfig)
+    runner: RunnerConfig = field(default_factory=RunnerConfig)
+    instance: str = "default"  # 配置档名称，由加载时填入
+
+    def missing_paths(self, names):
+        """检查指定的路径配置是否存在，返回[(配置项, 路径)]"""
+        missing = []
+        for name in names:
+            section, key = name.split(".")
+            path = getattr(getattr(self, section), key)
+            if not os.path.exists(path):
+                missing.append((name, path))
+        return missing
+
+    def check_paths(self, names):
+        """与missing_paths相同，有不存在的路径时抛出ConfigError"""
+        missing = self.missing_paths(names)
+        if missing:
+            raise ConfigError("；".join(f"{name} 指向的文件不存在: {path}" for name, path in missing))
+
+
+def _check_scalar(expected, value, meta, where):
+    """检查单个值的类型和取值范围，返回转换后的值"""
+    if expected is bool:
+        if not isinstance(value, bool):
+            raise ConfigError(f"{where}: 应为true/false，实际为 {value!r}")
+        return value
+    if expected in (int, float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or (
+                expected is int and not isinstance(value, int)):
+            raise ConfigError(f"{where}: 应为{'整数' if expected is int else '数字'}，实际为 {value!r}")
+        # json.load接受NaN和Infinity，NaN与任何数比较都为False，会绕过下面的范围检查
+        if not math.isfinite(value):
+            raise ConfigError(f"{where}: 应为有限的数字，实际为 {value!r}")
+        if "min" in meta and value < meta["min"]:
+            raise ConfigError(f"{where}: 不能小于 {meta['min']}，实际为 {value}")
+        if "max" in meta and value > meta["max"]:
+            raise ConfigError(f"{where}: 不能大于 {meta['max']}，实际为 {value}")
+        return expected(value)
+    if expected is str:
+        if not isinstance(value, str) or not value:
+            raise ConfigError(f"{where}: 应为非空字符串，实际为 {value!r}")
+        if "choices" in meta and value not in meta["choices"]:
+            raise ConfigError(f"{where}: 只能是 {'/'.join(meta['choices'])}，实际为 {value!r}")
+        if "pattern" in meta and not re.match(meta["pattern"], value):
+            raise ConfigError(f"{where}: 格式不正确 {value!r}")
+        return value
+    raise ConfigError(f"{where}: 不支持的配置类型 {expected}")
+
+
+def _build(cls, data, where):
+    """按数据类定义校验并构造配置，未知的键视为错误（多半是拼写错误）"""
+    if not isinstance(data, dict):
+        raise ConfigError(f"{where}: 应为对象，实际为 {data!r}")
+    hints = typing.get_type_hints(cls)
+    known = {f.name for f in fields(cls) if f.name != "instance"}
+    unknown = sorted(set(data) - known)
+    if unknown:
+        raise ConfigError(f"{where}: 未知的配置项 {', '.join(unknown)}")
+
+    values = {}
+    for f in fields(cls):
+        if f.name not in data:
+            continue
+        expected = hints[f.name]
+        value = data[f.name]
+        key = f"{where}.{f.name}"
+        if is_dataclass(expected):
+            values[f.name] = _build(expected, value, key)
+        elif typing.get_origin(expected) is dict:
+            if not isinstance(value, dict):
+                raise ConfigError(f"{key}: 应为对象，实际为 {value!r}")
+            value_type = typing.get_args(expected)[1]
+            values[f.name] = {k: _check_scalar(value_type, v, f.metadata, f"{key}.{k}") for k, v in value.items()}
+        elif typing.get_origin(expected) is typing.Union:
+            # 目前只有Optional[...]
+            values[f.name] = None if value is None else _check_scalar(
+                typing.get_args(expected)[0], value, f.metadata, key)
+        else:
+            values[f.name] = _check_scalar(expected, value, f.metadata, key)
+    return cls(**values)
+
+
+def _merge(base, override):
+    """深度合并两个配置字典，override优先"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _resolve_profile(profiles, name, chain=()):
+    """展开extends继承链"""
+    if name not in profiles:
+        raise ConfigError(f"配置档不存在: {name}")
+    if name in chain:
+        raise ConfigError(f"配置档循环继承: {' -> '.join(chain + (name,))}")
+    profile = profiles[name]
+    if not isinstance(profile, dict):
+        raise ConfigError(f"profiles.{name}: 应为对象")
+    profile = dict(profile)
+    parent = profile.pop("extends", None)
+    if parent is None:
+        return profile
+    if not isinstance(parent, str):
+        raise ConfigError(f"profiles.{name}.extends: 应为配置档名称，实际为 {parent!r}")
+    return _merge(_resolve_profile(profiles, parent, chain + (name,)), profile)
+
+
+def load_config(path=DEFAULT_CONFIG_PATH, instance=None):
+    """加载并校验配置文件，文件不存在时使用默认值
+
+    所有配置档都会被校验，任何一个不合法都会抛出ConfigError，
+    而不是等到定时任务运行时才出错。
+
+    Args:
+        path: 配置文件路径
+        instance: 配置档名称，默认使用文件中的active_profile
+
+    Returns:
+        Config
+    """
+    if not os.path.exists(path):
+        if instance not in (None, "default"):
+            raise ConfigError(f"配置文件不存在，无法使用配置档 {instance}: {path}")
+        return Config()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except ValueError as e:
+        raise ConfigError(f"配置文件不是合法的JSON: {path}: {e}")
+
+    if not isinstance(data, dict):
+        raise ConfigError("配置文件顶层应为对象")
+    unknown = sorted(set(data) - {"active_profile", "profiles"})
+    if unknown:
+        raise ConfigError(f"未知的配置项 {', '.join(unknown)}")
+    profiles = data.get("profiles", {})
+    if not isinstance(profiles, dict) or not profiles:
+        raise ConfigError("profiles: 至少需要一个配置档")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    configs = {}
+    for name in profiles:
+        config = _build(Config, _resolve_profile(profiles, name), f"profiles.{name}")
+        config.instance = name
+        # 阈值的键写错时不会报错，只是静默不生效，这里要求对应的模板文件存在
+        for template_path in config.matching.thresholds:
+            if not os.path.isfile(os.path.join(base_dir, template_path)):
+                raise ConfigError(f"profiles.{name}.matching.thresholds: 模板文件不存在: {template_path}")
+        configs[name] = config
+
+    instance = instance or data.get("active_profile") or "default"
+    if instance not in configs:
+        raise ConfigError(f"配置档不存在: {instance}（可用: {', '.join(configs)}）")
+    return configs[instance]
+
+
+class ConfigWatcher:
+    """配置热加载：文件修改后重新加载，新配置不合法时保留旧配置"""
+
+    def __init__(self, path=DEFAULT_CONFIG_PATH, instance=None, required_paths=()):
+        """
+        :param path: 配置文件路径
+        :param instance: 配置档名称
+        :param required_paths: 必须存在的路径配置项，如"runner.python_path"；启动和每次重新加载时都检查
+        """
+        self.path = path
+        self.instance = instance
+        self.required_paths = list(required_paths)
+        self.config = self._load()
+        self._mtime = self._current_mtime()
+
+    def _load(self):
+        config = load_config(self.path, self.instance)
+        config.check_paths(self.required_paths)
+        return config
+
+    def _current_mtime(self):
+        return os.path.getmtime(self.path) if os.path.exists(self.path) else None
+
+    def reload_if_changed(self):
+        """文件有变化时重新加载
+
+        新配置不合法时保留原配置并抛出ConfigError，由调用方写入日志；
+        同一次修改只报告一次，文件再次修改后才重新尝试。
+
+        Returns:
+            配置是否已更新
+        """
+        mtime = self._current_mtime()
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            self.config = self._load()
+        except OSError as e:
+            raise ConfigError(f"读取配置文件失败: {e}")
+        return True
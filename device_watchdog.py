@@ -0,0 +1,84 @@
+import socket
+import subprocess
+import threading
+
+ADB_SERVER_ADDRESS = ("127.0.0.1", 5037)  # adb server默认监听地址
+
+# 设备状态
+STATE_DEVICE = "device"  # 在线可用
+STATE_OFFLINE = "offline"  # adb server正常，但设备离线或未连接
+STATE_NO_SERVER = "no_server"  # adb server未运行
+
+
+class DeviceWatchdog(threading.Thread):
+    """后台设备健康检查线程
+
+    按固定间隔检查adb server端口和设备get-state，把状态发布给控制器；
+    发现设备离线时立即在后台重连，主流程在等待界面时无需自己处理。
+    """
+
+    def __init__(self, controller, interval=5, command_timeout=5):
+        """
+        :param controller: LDPlayerController实例，需提供adb_path、device_address和set_device_state
+        :param interval: 检查间隔（秒）
+        :param command_timeout: 单条ADB命令超时时间（秒）
+        """
+        super().__init__(name="DeviceWatchdog", daemon=True)
+        self.controller = controller
+        self.interval = interval
+        self.command_timeout = command_timeout
+        self._stop_event = threading.Event()
+
+    def _run_adb(self, command):
+        """执行一条带超时的ADB命令，返回(是否成功, 输出)"""
+        try:
+            result = subprocess.run([self.controller.adb_path] + command, capture_output=True, text=True,
+                                    encoding='utf-8', errors='ignore', timeout=self.command_timeout)
+            return result.returncode == 0, result.stdout.strip()
+        except (subprocess.TimeoutExpired, OSError) as e:
+            return False, str(e)
+
+    def check_adb_server(self):
+        """检查adb server端口是否可连接"""
+        try:
+            with socket.create_connection(ADB_SERVER_ADDRESS, timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def probe(self):
+        """检查一次设备状态"""
+        if not self.check_adb_server():
+            return STATE_NO_SERVER
+        ok, output = self._run_adb(["-s", self.controller.device_address, "get-state"])
+        if ok and output == "device":
+            return STATE_DEVICE
+        return STATE_OFFLINE
+
+    def reconnect(self, state):
+        """后台重连设备，adb server未运行时先启动server"""
+        if state == STATE_NO_SERVER:
+            print("看门狗：adb server未运行，正在启动...")
+            self._run_adb(["start-server"])
+        print(f"看门狗：设备{self.controller.device_address}不可用，正在重连...")
+        ok, output = self._run_adb(["connect", self.controller.device_address])
+        if ok and "connected to" in output:
+            print("看门狗：重连成功")
+            return True
+        print(f"看门狗：重连失败 {output}")
+        return False
+
+    def run(self):
+        while not self._stop_event.is_set():
+            state = self.probe()
+            if state != STATE_DEVICE and self.reconnect(state):
+                state = self.probe()
+            self.controller.set_device_state(state)
+            self._stop_event.wait(self.interval)
+
+    def stop(self, timeout=None):
+        """停止检查线程"""
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout if timeout is not None else self.command_timeout * 3)
+
@@ -0,0 +1,251 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+COST_SMOOTHING = 0.5  # 实测耗时的指数平滑系数，新测量值所占比重
+
+
+class FFTMatcher:
+    """基于频域的批量模板匹配引擎
+
+    每帧截图只做一次DFT，选中的模板在频域内完成相关运算，
+    输出与cv2.TM_CCOEFF_NORMED等价的归一化匹配度（存在浮点误差）。
+    是否走频域由实测耗时决定：整帧DFT和积分图是同一帧上所有模板共摊的固定开销，
+    每个模板还需要一次整帧大小的逆变换；只有同一帧上的模板足够多、
+    逐个matchTemplate的总耗时超过这些开销时才用频域方法，否则直接cv2.matchTemplate。
+    """
+
+    def __init__(self, template_paths=()):
+        """
+        :param template_paths: 需要注册的模板路径列表
+        """
+        self.templates = {}  # 模板路径 -> 模板图像
+        self._spectrum_cache = {}  # (模板路径, DFT尺寸) -> 模板频谱共轭（complex64）
+        self._norm_cache = {}  # 模板路径 -> 去均值后模板的平方和
+        self.direct_cost = {}  # (模板路径, 帧尺寸) -> 单次cv2.matchTemplate耗时（秒）
+        self.shared_cost = {}  # 帧尺寸 -> 整帧DFT和积分图耗时（秒）
+        self.fft_cost = {}  # 帧尺寸 -> 每个模板的频域相关和归一化耗时（秒）
+        for path in template_paths:
+            self.register(path)
+
+    def register(self, template_path, image=None):
+        """注册模板，image为None时从文件加载"""
+        if image is None:
+            if not os.path.exists(template_path):
+                raise FileNotFoundError(f"目标图像不存在: {template_path}")
+            image = cv2.imread(template_path)
+            if image is None:
+                raise ValueError(f"无法加载目标图像: {template_path}")
+        self.templates[template_path] = image
+        self._spectrum_cache = {key: value for key, value in self._spectrum_cache.items()
+                                if key[0] != template_path}
+        self._norm_cache.pop(template_path, None)
+        self.direct_cost = {key: value for key, value in self.direct_cost.items() if key[0] != template_path}
+
+    @staticmethod
+    def _update_cost(table, key, seconds):
+        """记录一次实测耗时，已有记录时做指数平滑，避免偶发抖动改变匹配方法"""
+        if key in table:
+            seconds = table[key] + COST_SMOOTHING * (seconds - table[key])
+        table[key] = seconds
+
+    def plan(self, frame_shape, template_paths, shared_paid=False):
+        """按实测耗时选出走频域方法更快的模板
+
+        设逐个匹配模板i耗时d_i，频域方法每个模板耗时c，共摊开销S：
+        按节省d_i - c从大到小取前k个，使总节省减去S最大；不划算时返回空列表。
+        模板的d_i或该帧尺寸的S、c尚未测量时不能比较，按直接匹配处理。
+
+        Args:
+            frame_shape: 帧的shape
+            template_paths: 同一帧上需要匹配的模板
+            shared_paid: 本帧的DFT和积分图是否已经算过（此时S记为0）
+
+        Returns:
+            应当走频域方法的模板列表
+        """
+        if frame_shape not in self.shared_cost:
+            return []
+        shared = 0.0 if shared_paid else self.shared_cost[frame_shape]
+        per_template = self.fft_cost[frame_shape]
+        savings = sorted(((self.direct_cost[(path, frame_shape)] - per_template, path)
+                          for path in template_paths if (path, frame_shape) in self.direct_cost), reverse=True)
+        best_gain, best_count, gain = 0.0, 0, -shared
+        for count, (saving, _) in enumerate(savings, 1):
+            gain += saving
+            if gain > best_gain:
+                best_gain, best_count = gain, count
+        return [path for _, path in savings[:best_count]]
+
+    @staticmethod
+    def _as_channels(image):
+        """统一转为(高, 宽, 通道)的float64数组"""
+        image = np.asarray(image, dtype=np.float64)
+        if image.ndim == 2:
+            image = image[:, :, np.newaxis]
+        return image
+
+    def _template_spectrum(self, template_path, dft_size):
+        """取出（必要时计算）去均值模板在指定DFT尺寸下的频谱共轭，按通道求和前使用
+
+        频谱与整帧同样大小，以complex64保存：1920x1080的三通道帧每个模板约24 MiB，
+        是complex128的一半，匹配度误差仍远小于阈值精度
+        """
+        key = (template_path, dft_size)
+        if key not in self._spectrum_cache:
+            template = self._as_channels(self.templates[template_path])
+            centered = template - template.mean(axis=(0, 1))
+            self._norm_cache[template_path] = float(np.sum(centered * centered))
+            spectrum = np.fft.rfft2(centered, s=dft_size, axes=(0, 1))
+            self._spectrum_cache[key] = np.conj(spectrum).astype(np.complex64)
+        return self._spectrum_cache[key]
+
+    @staticmethod
+    def _normalize(numerator, denominator):
+        """按OpenCV的规则把相关值归一化到[-1, 1]"""
+        scores = np.zeros_like(numerator)
+        valid = denominator > np.finfo(np.float32).eps
+        abs_num = np.abs(numerator)
+        inside = valid & (abs_num < denominator)
+        scores[inside] = numerator[inside] / denominator[inside]
+        # 浮点误差导致略超出范围时截断为±1，与OpenCV一致
+        edge = valid & ~inside & (abs_num < denominator * 1.125)
+        scores[edge] = np.sign(numerator[edge])
+        return scores
+
+    def _transform_frame(self, frame):
+        """整帧只做一次DFT并计算积分图，本帧的所有频域模板共用
+
+        Returns:
+            (DFT尺寸, 帧频谱, 积分图, 平方积分图)
+        """
+        frame_height, frame_width = frame.shape[:2]
+        image = self._as_channels(frame)
+        # 尺寸不小于帧即可保证有效区域内无循环混叠
+        dft_size = (cv2.getOptimalDFTSize(frame_height), cv2.getOptimalDFTSize(frame_width))
+        frame_spectrum = np.fft.rfft2(image, s=dft_size, axes=(0, 1))
+
+        # 积分图用于求每个窗口内的像素和与平方和
+        channels = image.shape[2]
+        integral = np.zeros((frame_height + 1, frame_width + 1, channels))
+        integral_sq = np.zeros_like(integral)
+        integral[1:, 1:] = image.cumsum(axis=0).cumsum(axis=1)
+        integral_sq[1:, 1:] = (image * image).cumsum(axis=0).cumsum(axis=1)
+        return dft_size, frame_spectrum, integral, integral_sq
+
+    def _correlate(self, template_path, transform):
+        """用已变换的帧计算一个模板的归一化匹配度图"""
+        dft_size, frame_spectrum, integral, integral_sq = transform
+        frame_height, frame_width = integral.shape[0] - 1, integral.shape[1] - 1
+        height, width = self.templates[template_path].shape[:2]
+        out_height = frame_height - height + 1
+        out_width = frame_width - width + 1
+
+        spectrum = self._template_spectrum(template_path, dft_size)
+        # 各通道的相关结果线性相加，先在频域求和，只做一次逆变换
+        correlation = np.fft.irfft2((frame_spectrum * spectrum).sum(axis=2), s=dft_size)
+        numerator = correlation[:out_height, :out_width]
+
+        window_sum = (integral[height:, width:] - integral[:out_height, width:]
+                      - integral[height:, :out_width] + integral[:out_height, :out_width])
+        window_sq = (integral_sq[height:, width:] - integral_sq[:out_height, width:]
+                     - integral_sq[height:, :out_width] + integral_sq[:out_height, :out_width])
+        window_var = (window_sq - window_sum * window_sum / (height * width)).sum(axis=2)
+        denominator = np.sqrt(np.maximum(window_var, 0) * self._norm_cache[template_path])
+        return self._normalize(numerator, denominator).astype(np.float32)
+
+    def _match_direct(self, frame, template_path):
+        """逐个cv2.matchTemplate，同时更新该模板的实测耗时"""
+        start = time.perf_counter()
+        result = cv2.matchTemplate(frame, self.templates[template_path], cv2.TM_CCOEFF_NORMED)
+        self._update_cost(self.direct_cost, (template_path, frame.shape), time.perf_counter() - start)
+        return result
+
+    def match_all(self, frame, template_paths=None):
+        """对一帧计算多个模板的匹配度图
+
+        Args:
+            frame: OpenCV图像（BGR或灰度数组）
+            template_paths: 需要匹配的模板，默认匹配全部已注册模板
+
+        Returns:
+            {模板路径: 匹配度图}，模板大于截图时值为None
+        """
+        paths = list(self.templates) if template_paths is None else list(template_paths)
+        frame_height, frame_width = frame.shape[:2]
+
+        scores = {}
+        pending = []
+        for path in paths:
+            height, width = self.templates[path].shape[:2]
+            if height > frame_height or width > frame_width:
+                scores[path] = None
+            elif (path, frame.shape) not in self.direct_cost:
+                # 第一次在该尺寸的帧上遇到的模板先直接匹配，测得的耗时用于之后选择方法
+                scores[path] = self._match_direct(frame, path)
+            else:
+                pending.append(path)
+        if not pending:
+            return scores
+
+        transform = None
+        if frame.shape not in self.shared_cost and len(pending) > 1:
+            # 该尺寸的帧第一次参与批量匹配：实测一次共摊开销和单模板开销，测量用的模板结果照常返回
+            path = pending.pop(0)
+            start = time.perf_counter()
+            transform = self._transform_frame(frame)
+            self.shared_cost[frame.shape] = time.perf_counter() - start
+            self._template_spectrum(path, transform[0])  # 模板频谱只算一次，不计入单模板耗时
+            start = time.perf_counter()
+            scores[path] = self._correlate(path, transform)
+            self.fft_cost[frame.shape] = time.perf_counter() - start
+
+        fft_paths = self.plan(frame.shape, pending, shared_paid=transform is not None)
+        for path in pending:
+            if path not in fft_paths:
+                scores[path] = self._match_direct(frame, path)
+        if not fft_paths:
+            return scores
+
+        if transform is None:
+            start = time.perf_counter()
+            transform = self._transform_frame(frame)
+            self._update_cost(self.shared_cost, frame.shape, time.perf_counter() - start)
+        for path in fft_paths:
+            self._template_spectrum(path, transform[0])
+            start = time.perf_counter()
+            scores[path] = self._correlate(path, transform)
+            self._update_cost(self.fft_cost, frame.shape, time.perf_counter() - start)
+        return scores
+
+    def find_all(self, frame, template_paths=None, threshold=0.8):
+        """对一帧查找多个模板
+
+        Returns:
+            {模板路径: 中心坐标(x, y)或None}
+        """
+        return {path: position for path, (_, position) in self.find_all_scored(frame, template_paths, threshold).items()}
+
+    def find_all_scored(self, frame, template_paths=None, threshold=0.8):
+        """与find_all相同，同时返回每个模板的最高匹配度
+
+        Returns:
+            {模板路径: (最高匹配度, 中心坐标(x, y)或None)}，模板大于截图时为(0.0, None)
+        """
+        positions = {}
+        for path, result in self.match_all(frame, template_paths).items():
+            if result is None:
+                positions[path] = (0.0, None)
+                continue
+            _, max_score, _, _ = cv2.minMaxLoc(result)
+            locations = np.where(result >= threshold)
+            if len(locations[0]) == 0:
+                positions[path] = (float(max_score), None)
+                continue
+            # 与find_image_in_screenshot一致：取最左上角的第一个达标位置
+            height, width = self.templates[path].shape[:2]
+            positions[path] = (float(max_score),
+                               (int(locations[1][0]) + width // 2, int(locations[0][0]) + height // 2))
+        return positions
@@ -0,0 +1,113 @@
+import collections
+import datetime
+import json
+import os
+import threading
+import time
+import zipfile
+
+import cv2
+
+
+class FlightRecorder:
+    """内存中的截图飞行记录仪
+
+    保留最近若干帧（缩小并压缩为JPEG）以及对应的匹配分数和发出的命令，
+    总内存不超过固定预算；只有阶段失败时才写出带时间戳的压缩包，
+    成功的日子不产生任何额外的磁盘读写。
+    """
+
+    def __init__(self, max_frames=60, memory_budget=8 * 1024 * 1024, scale=0.5, jpeg_quality=70,
+                 max_events=2000, output_dir="failures"):
+        """
+        :param max_frames: 最多保留的帧数
+        :param memory_budget: 帧数据占用内存上限（字节）
+        :param scale: 保存前的缩放比例
+        :param jpeg_quality: JPEG压缩质量，0-100
+        :param max_events: 最多保留的事件条数（匹配分数、命令）
+        :param output_dir: 失败记录的输出目录
+        """
+        self.max_frames = max_frames
+        self.memory_budget = memory_budget
+        self.scale = scale
+        self.jpeg_quality = jpeg_quality
+        self.output_dir = output_dir
+        self._frames = collections.deque()  # (时间戳, JPEG字节)
+        self._frame_bytes = 0
+        self._events = collections.deque(maxlen=max_events)  # (时间戳, 类型, 内容)
+        self._lock = threading.Lock()  # 看门狗等后台线程也会记录命令
+
+    def record_frame(self, image):
+        """压缩并记录一帧，超出帧数或内存预算时丢弃最旧的帧"""
+        if image is None:
+            return
+        if self.scale != 1.0:
+            image = cv2.resize(image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            return
+        data = encoded.tobytes()
+        with self._lock:
+            self._frames.append((time.time(), data))
+            self._frame_bytes += len(data)
+            while self._frames and (len(self._frames) > self.max_frames or self._frame_bytes > self.memory_budget):
+                _, dropped = self._frames.popleft()
+                self._frame_bytes -= len(dropped)
+
+    def record_score(self, target_image_path, score, position=None):
+        """记录一次模板匹配的最高分数和位置"""
+        self._add_event("match", {"target": target_image_path, "score": round(float(score), 4),
+                                  "position": [int(v) for v in position] if position else None})
+
+    def record_command(self, command):
+        """记录一条发出的命令"""
+        self._add_event("command", command if isinstance(command, str) else " ".join(map(str, command)))
+
+    def record_note(self, text):
+        """记录阶段开始、完成等说明"""
+        self._add_event("note", text)
+
+    def _add_event(self, kind, content):
+        with self._lock:
+            self._events.append((time.time(), kind, content))
+
+    @property
+    def frame_bytes(self):
+        """当前帧数据占用的内存（字节）"""
+        return self._frame_bytes
+
+    def dump(self, reason):
+        """把当前记录写入带时间戳的zip，返回文件路径；没有任何记录时返回None"""
+        with self._lock:
+            frames = list(self._frames)
+            events = list(self._events)
+        if not frames and not events:
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_reason = "".join(c if c.isalnum() or c in "-_" else "_" for c in reason)
+        archive_path = os.path.join(self.output_dir, f"{stamp}_{safe_reason}.zip")
+
+        def format_time(timestamp):
+            return datetime.datetime.fromtimestamp(timestamp).strftime("%H:%M:%S.%f")[:-3]
+
+        timeline = [{"time": format_time(ts), "type": kind, "content": content} for ts, kind, content in events]
+        frame_index = []
+        # 帧已是JPEG，zip内不再压缩
+        with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_STORED) as archive:
+            for index, (timestamp, data) in enumerate(frames):
+                name = f"frames/{index:03d}_{format_time(timestamp).replace(':', '')}.jpg"
+                archive.writestr(name, data)
+                frame_index.append({"file": name, "time": format_time(timestamp)})
+            summary = {"reason": reason, "frames": frame_index, "events": timeline}
+            archive.writestr("timeline.json", json.dumps(summary, ensure_ascii=False, indent=2))
+        print(f"失败现场已保存到 {archive_path}（{len(frames)}帧，{len(events)}条事件）")
+        return archive_path
+
+    def clear(self):
+        """清空记录"""
+        with self._lock:
+            self._frames.clear()
+            self._events.clear()
+            self._frame_bytes = 0
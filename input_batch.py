@@ -0,0 +1,217 @@
+import queue
+import re
+import subprocess
+import threading
+
+# sendevent使用的Linux输入事件常量
+EV_SYN = 0
+EV_KEY = 1
+EV_ABS = 3
+SYN_REPORT = 0
+BTN_TOUCH = 330
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+ABS_MT_TRACKING_ID = 0x39
+
+
+class InputSession:
+    """通过一个常驻adb shell批量注入输入事件
+
+    点击、滑动、按键先进入队列，flush时一次写入同一个shell会话，
+    不再为每个事件单独启动adb进程；连续的按键合并成一条input keyevent，
+    设备上也只启动一次input。use_sendevent=True时点击改用sendevent直接写触摸设备。
+    """
+
+    def __init__(self, adb_path, device_address, use_sendevent=False, screen_size=None, timeout=10):
+        """
+        :param adb_path: adb可执行文件路径
+        :param device_address: 设备地址
+        :param use_sendevent: 点击和滑动是否使用sendevent底层注入
+        :param screen_size: 屏幕分辨率(宽, 高)，sendevent换算触摸坐标时使用
+        :param timeout: 等待一批事件执行完成的超时时间（秒）
+        """
+        self.adb_path = adb_path
+        self.device_address = device_address
+        self.use_sendevent = use_sendevent
+        self.screen_size = screen_size
+        self.timeout = timeout
+        self.touch_device = None  # (设备节点, X最大值, Y最大值)，sendevent模式下自动探测
+        self._touch_lookup_failed = False  # 探测失败后本会话不再重试，直接使用input命令
+        self._pending = []  # 待发送的事件：("shell", 命令) 或 ("key", 键码)
+        self._process = None
+        self._output = queue.Queue()
+        self._batch_id = 0
+
+    def _start_shell(self):
+        """启动常驻shell和读取输出的后台线程"""
+        # 以二进制方式读写：文本模式在Windows上会把写入的\n转换为\r\n，
+        # 设备端sh会把\r当作参数的一部分，input keyevent KEYCODE_BACK\r被解析为KEYCODE_UNKNOWN
+        self._process = subprocess.Popen([self.adb_path, "-s", self.device_address, "shell"],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.STDOUT)
+        self._output = queue.Queue()
+        threading.Thread(target=self._read_output, args=(self._process, self._output),
+                         name="InputSessionReader", daemon=True).start()
+
+    @staticmethod
+    def _read_output(process, output):
+        for line in process.stdout:
+            output.put(line.decode("utf-8", errors="ignore").rstrip("\r\n"))
+        output.put(None)
+
+    def _shell_alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def tap(self, x, y):
+        """加入一次点击"""
+        command = self._sendevent_touch([(x, y)]) if self.use_sendevent else None
+        self._pending.append(("shell", command or f"input tap {x} {y}"))
+
+    def swipe(self, x1, y1, x2, y2, duration_ms=300):
+        """加入一次滑动"""
+        command = None
+        if self.use_sendevent:
+            # 按约16ms一帧插值出移动轨迹
+            steps = max(2, duration_ms // 16)
+            points = [(x1 + (x2 - x1) * i // steps, y1 + (y2 - y1) * i // steps) for i in range(steps + 1)]
+            command = self._sendevent_touch(points, frame_delay=duration_ms / 1000 / steps)
+        self._pending.append(("shell", command or f"input swipe {x1} {y1} {x2} {y2} {duration_ms}"))
+
+    def keyevent(self, keycode):
+        """加入一次按键，如KEYCODE_BACK"""
+        self._pending.append(("key", str(keycode)))
+
+    def clear(self):
+        """丢弃尚未发送的事件"""
+        self._pending = []
+
+    def _build_script(self):
+        """把队列转换为shell脚本，连续按键合并成一条input keyevent"""
+        lines = []
+        keys = []
+        for kind, value in self._pending:
+            if kind == "key":
+                keys.append(value)
+                continue
+            if keys:
+                lines.append("input keyevent " + " ".join(keys))
+                keys = []
+            lines.append(value)
+        if keys:
+            lines.append("input keyevent " + " ".join(keys))
+        return lines
+
+    def flush(self):
+        """发送队列中的全部事件并等待执行完成
+
+        Returns:
+            操作是否成功
+        """
+        if not self._pending:
+            return True
+        lines = self._build_script()
+        self._pending = []
+
+        # shell断开（如设备重连）时重启一次
+        for _ in range(2):
+            try:
+                if not self._shell_alive():
+                    self._start_shell()
+                return self._run_batch(lines)
+            except (OSError, ValueError) as e:
+                print(f"输入会话异常: {e}")
+                self.close()
+        return False
+
+    def _run_batch(self, lines):
+        """写入一批命令，读到结束标记后返回"""
+        self._batch_id += 1
+        marker = f"__INPUT_DONE_{self._batch_id}__"
+        self._process.stdin.write(("\n".join(lines) + f"\necho {marker}\n").encode("utf-8"))
+        self._process.stdin.flush()
+        while True:
+            try:
+                line = self._output.get(timeout=self.timeout)
+            except queue.Empty:
+                print(f"输入事件执行超时（超过{self.timeout}秒）")
+                self.close()
+                return False
+            if line is None:
+                raise OSError("adb shell已退出")
+            if line.strip() == marker:
+                return True
+            if line.strip():
+                print(f"输入事件输出: {line}")
+
+    def discover_touch_device(self):
+        """通过getevent -p查找支持多点触控的设备节点及坐标范围"""
+        try:
+            result = subprocess.run([self.adb_path, "-s", self.device_address, "shell", "getevent", "-p"],
+                                    capture_output=True, text=True, encoding='utf-8', errors='ignore',
+                                    timeout=self.timeout)
+        except (subprocess.TimeoutExpired, OSError) as e:
+            print(f"获取触摸设备失败: {e}")
+            return None
+
+        device = None
+        ranges = {}
+        for line in result.stdout.splitlines():
+            match = re.match(r"add device \d+: (\S+)", line)
+            if match:
+                if device and ABS_MT_POSITION_X in ranges and ABS_MT_POSITION_Y in ranges:
+                    break
+                device, ranges = match.group(1), {}
+                continue
+            match = re.search(r"\b(0035|0036)\s*:.*\bmax (\d+)", line)
+            if match:
+                ranges[int(match.group(1), 16)] = int(match.group(2))
+        if device and ABS_MT_POSITION_X in ranges and ABS_MT_POSITION_Y in ranges:
+            self.touch_device = (device, ranges[ABS_MT_POSITION_X], ranges[ABS_MT_POSITION_Y])
+            return self.touch_device
+        print("未找到多点触控设备")
+        return None
+
+    def _sendevent_touch(self, points, frame_delay=0):
+        """生成按下、依次移动、抬起的sendevent命令序列（多点触控协议B）
+
+        Returns:
+            命令字符串，触摸设备或分辨率不可用时返回None（改用input命令）
+        """
+        if self.touch_device is None:
+            # getevent -p是一次阻塞的adb调用，失败一次后不再为每个点击重复探测
+            if self._touch_lookup_failed:
+                return None
+            if self.discover_touch_device() is None:
+                print("sendevent不可用，本次会话改用input命令")
+                self._touch_lookup_failed = True
+                return None
+        if not self.screen_size:
+            print("屏幕分辨率未获取，无法使用sendevent")
+            return None
+        device, max_x, max_y = self.touch_device
+        width, height = self.screen_size
+
+        def event(event_type, code, value):
+            return f"sendevent {device} {event_type} {code} {value}"
+
+        commands = [event(EV_ABS, ABS_MT_TRACKING_ID, 0), event(EV_KEY, BTN_TOUCH, 1)]
+        for index, (x, y) in enumerate(points):
+            if index and frame_delay:
+                commands.append(f"sleep {frame_delay:.3f}")
+            commands.append(event(EV_ABS, ABS_MT_POSITION_X, x * max_x // max(1, width - 1)))
+            commands.append(event(EV_ABS, ABS_MT_POSITION_Y, y * max_y // max(1, height - 1)))
+            commands.append(event(EV_SYN, SYN_REPORT, 0))
+        commands += [event(EV_ABS, ABS_MT_TRACKING_ID, -1), event(EV_KEY, BTN_TOUCH, 0),
+                     event(EV_SYN, SYN_REPORT, 0)]
+        return "; ".join(commands)
+
+    def close(self):
+        """关闭常驻shell"""
+        if self._process is not None:
+            try:
+                if self._process.poll() is None:
+                    self._process.stdin.close()
+                    self._process.wait(timeout=2)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                self._process.kill()
+            self._process = None
@@ -0,0 +1,319 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import statistics
+import sys
+
+from checkpoint import STAGE_NAMES
+
+# 运行脚本V1.py写入的运行边界
+START_RE = re.compile(r"={5,} 开始运行：(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?) ={5,}")
+END_RE = re.compile(r"={5,} 运行结束：(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?) ={5,}")
+SCHEDULER_START = "定时任务已启动"  # 调度器重启，未结束的运行视为中断
+
+# 签到脚本的阶段，与签到脚本V1.py中的STAGES共用同一份名称
+STAGE_ORDER = STAGE_NAMES
+STAGE_START_RE = re.compile(r"【阶段】开始: (\w+)")
+STAGE_DONE_RE = re.compile(r"【阶段】(?:完成|跳过（今日已完成）): (\w+)")
+# 没有阶段标记的旧日志，根据各阶段完成时的输出推断进度
+LEGACY_STAGE_DONE = {
+    "点击fgo图标!!": "launch_game",
+    "找到请点击游戏界面，执行点击...": "click_game",
+    "找到请点击屏幕，执行点击...": "click_screen",
+    "找到公告，执行关闭...": "close_notice",
+    "找到是否退出按钮!!!": "exit_game",
+}
+SKIPPED_MARK = "已完成签到，跳过本次运行"
+RECOVERY_MARKS = ("操作超时，重新重启模拟器", "检测到设备离线，正在重启模拟器")
+CONNECT_RETRY_RE = re.compile(r"连接\S*失败，等待\d+秒后重试")
+# 签到脚本每次运行都会输出的内容；一行都识别不到时（如整段输出是乱码）无法判断运行结果
+SCRIPT_OUTPUT_MARKS = ("正在连接到", "获取屏幕分辨率", "正在截取屏幕", "截图已保存到", "正在重启模拟器", "程序执行完毕")
+
+INDEX_VERSION = 2
+HEAD_BYTES = 4096  # 用日志开头的哈希判断文件是否被截断或替换
+
+
+def _parse_time(text):
+    fmt = "%Y-%m-%d %H:%M:%S.%f" if "." in text else "%Y-%m-%d %H:%M:%S"
+    return datetime.datetime.strptime(text, fmt)
+
+
+class LogIndexer:
+    """log.txt增量索引
+
+    只解析上次索引之后新增的字节，索引文件保存每次运行的起止字节偏移
+    和摘要（开始、结束、耗时、状态、失败阶段、重试次数），查询时不再扫描整个日志。
+    """
+
+    def __init__(self, log_path="log.txt", index_path=None):
+        """
+        :param log_path: 日志文件路径
+        :param index_path: 索引文件路径，默认为日志同目录下的<日志名>.index.json
+        """
+        self.log_path = log_path
+        self.index_path = index_path or log_path + ".index.json"
+        self.state = self._empty_state()
+
+    @staticmethod
+    def _empty_state():
+        return {"version": INDEX_VERSION, "offset": 0, "head": None, "head_length": 0, "runs": [], "open_run": None}
+
+    def _head_digest(self, length):
+        with open(self.log_path, "rb") as f:
+            return hashlib.sha1(f.read(length)).hexdigest()
+
+    def load(self):
+        """读取索引，版本不符或损坏时从头重建"""
+        self.state = self._empty_state()
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取索引失败，将重建: {e}")
+            return
+        if state.get("version") == INDEX_VERSION:
+            self.state = state
+
+    def save(self):
+        """写入索引（先写临时文件再替换）"""
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(temp_path, self.index_path)
+
+    def update(self):
+        """解析日志新增部分并保存索引
+
+        Returns:
+            新增的完整运行数
+        """
+        self.load()
+        size = os.path.getsize(self.log_path)
+        # 日志被截断或替换时从头索引
+        if size < self.state["offset"] or (
+                self.state["head"] and self.state["head"] != self._head_digest(self.state["head_length"])):
+            print("日志文件已变化，重新建立索引")
+            self.state = self._empty_state()
+
+        runs_before = len(self.state["runs"])
+        with open(self.log_path, "rb") as f:
+            f.seek(self.state["offset"])
+            data = f.read()
+        # 只处理完整的行，最后半行留到下次
+        complete = data[:data.rfind(b"\n") + 1]
+        offset = self.state["offset"]
+        for raw_line in complete.splitlines(keepends=True):
+            self._feed(raw_line.decode("utf-8", errors="replace").rstrip("\r\n"), offset, offset + len(raw_line))
+            offset += len(raw_line)
+
+        self.state["offset"] = offset
+        self.state["head_length"] = min(offset, HEAD_BYTES)
+        self.state["head"] = self._head_digest(self.state["head_length"])
+        self.save()
+        return len(self.state["runs"]) - runs_before
+
+    def _feed(self, line, offset, next_offset):
+        """按行推进解析状态，offset/next_offset为该行起止字节偏移"""
+        run = self.state["open_run"]
+        match = START_RE.search(line)
+        if match:
+            if run is not None:
+                self._close_run(None, offset, interrupted=True)
+            self.state["open_run"] = {
+                "offset": offset, "start": _parse_time(match.group(1)).isoformat(sep=" "),
+                "started": [], "completed": [], "skipped": False, "retries": 0, "connect_retries": 0,
+                "recognized": False,
+            }
+            return
+        if run is None:
+            return
+
+        match = END_RE.search(line)
+        if match:
+            self._close_run(_parse_time(match.group(1)), next_offset)
+            return
+        if SCHEDULER_START in line:
+            self._close_run(None, offset, interrupted=True)
+            return
+
+        recognized = any(mark in line for mark in SCRIPT_OUTPUT_MARKS)
+        match = STAGE_START_RE.search(line)
+        if match:
+            recognized = True
+            if match.group(1) not in run["started"]:
+                run["started"].append(match.group(1))
+        match = STAGE_DONE_RE.search(line)
+        stage = match.group(1) if match else LEGACY_STAGE_DONE.get(line.strip())
+        if stage:
+            recognized = True
+            if stage not in run["completed"]:
+                run["completed"].append(stage)
+        if SKIPPED_MARK in line:
+            recognized = True
+            run["skipped"] = True
+        if any(mark in line for mark in RECOVERY_MARKS):
+            recognized = True
+            run["retries"] += 1
+        if CONNECT_RETRY_RE.search(line):
+            recognized = True
+            run["connect_retries"] += 1
+        if recognized:
+            run["recognized"] = True
+
+    def _close_run(self, end_time, end_offset, interrupted=False):
+        """结束当前运行并生成摘要"""
+        run = self.state["open_run"]
+        self.state["open_run"] = None
+        start = datetime.datetime.fromisoformat(run["start"])
+        failing_stage = None
+        if run["skipped"]:
+            status = "skipped"
+        elif "exit_game" in run["completed"]:
+            status = "success"
+        elif not run["recognized"]:
+            # 没有任何可识别的输出，不能据此判定失败，也无从得知停在哪个阶段
+            status = "interrupted" if interrupted else "unknown"
+        else:
+            status = "interrupted" if interrupted else "failed"
+            # 优先取已开始但未完成的阶段，旧日志没有阶段标记时取第一个未完成的阶段
+            unfinished = [stage for stage in run["started"] if stage not in run["completed"]]
+            failing_stage = unfinished[-1] if unfinished else next(
+                (stage for stage in STAGE_ORDER if stage not in run["completed"]), None)
+        self.state["runs"].append({
+            "offset": run["offset"],
+            "end_offset": end_offset,
+            "start": run["start"],
+            "end": end_time.isoformat(sep=" ") if end_time else None,
+            "duration": round((end_time - start).total_seconds(), 3) if end_time else None,
+            "status": status,
+            "failing_stage": failing_stage,
+            "retries": run["retries"],
+            "connect_retries": run["connect_retries"],
+        })
+
+    def runs(self, since=None, until=None, status=None):
+        """按条件筛选运行摘要，since/until为YYYY-MM-DD
+
+        Returns:
+            [(运行编号, 运行摘要)]
+        """
+        selected = []
+        for index, run in enumerate(self.state["runs"]):
+            day = run["start"][:10]
+            if since and day < since or until and day > until:
+                continue
+            if status and run["status"] != status:
+                continue
+            selected.append((index, run))
+        return selected
+
+    def read_run(self, run):
+        """按偏移索引直接读出某次运行的原始日志"""
+        with open(self.log_path, "rb") as f:
+            f.seek(run["offset"])
+            data = f.read(run["end_offset"] - run["offset"])
+        return data.decode("utf-8", errors="replace")
+
+
+def _format_duration(seconds):
+    if seconds is None:
+        return "-"
+    return f"{int(seconds // 60)}分{seconds % 60:04.1f}秒"
+
+
+def print_runs(runs):
+    print(f"{'#':>4}  {'开始时间':<19}  {'耗时':>9}  {'状态':<11}  {'失败阶段':<12}  重启  连接重试")
+    for index, run in runs:
+        print(f"{index:>4}  {run['start'][:19]:<19}  {_format_duration(run['duration']):>9}  "
+              f"{run['status']:<11}  {run['failing_stage'] or '-':<12}  {run['retries']:>4}  {run['connect_retries']:>8}")
+
+
+def print_daily(runs):
+    """每天的签到耗时（同一天多次运行时取总耗时和最终状态）"""
+    days = {}
+    for _, run in runs:
+        days.setdefault(run["start"][:10], []).append(run)
+    print(f"{'日期':<10}  {'运行次数':>4}  {'总耗时':>9}  最终状态")
+    for day, day_runs in sorted(days.items()):
+        total = sum(run["duration"] or 0 for run in day_runs)
+        print(f"{day:<10}  {len(day_runs):>8}  {_format_duration(total):>9}  {day_runs[-1]['status']}")
+
+
+def print_stats(runs):
+    """运行统计：成功率、耗时分布、失败阶段"""
+    runs = [run for _, run in runs]
+    if not runs:
+        print("没有符合条件的运行记录")
+        return
+    durations = [run["duration"] for run in runs if run["status"] == "success" and run["duration"] is not None]
+    success = sum(1 for run in runs if run["status"] in ("success", "skipped"))
+    unknown = sum(1 for run in runs if run["status"] == "unknown")
+    # 无法判定结果的运行不计入成功率的分母
+    judged = len(runs) - unknown
+    rate = f"{success / judged:.0%}" if judged else "-"
+    print(f"运行次数: {len(runs)}，成功: {success}（{rate}）")
+    if unknown:
+        print(f"输出无法识别（如编码错误）: {unknown}次，未计入成功率")
+    if durations:
+        print(f"成功运行耗时: 平均 {_format_duration(statistics.mean(durations))}，"
+              f"中位数 {_format_duration(statistics.median(durations))}，最长 {_format_duration(max(durations))}")
+    print(f"模拟器重启恢复: {sum(run['retries'] for run in runs)}次，"
+          f"连接重试: {sum(run['connect_retries'] for run in runs)}次")
+    failures = {}
+    for run in runs:
+        if run["failing_stage"]:
+            failures[run["failing_stage"]] = failures.get(run["failing_stage"], 0) + 1
+    for stage, count in sorted(failures.items(), key=lambda item: -item[1]):
+        print(f"  失败于 {stage}: {count}次")
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="签到日志索引与历史运行查询")
+    parser.add_argument("--log", default="log.txt", help="日志文件路径")
+    parser.add_argument("--index", help="索引文件路径，默认为<日志>.index.json")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("update", help="只更新索引")
+    for name, help_text in (("runs", "列出每次运行"), ("daily", "按天汇总耗时"), ("stats", "统计成功率、耗时和失败阶段")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--since", help="起始日期 YYYY-MM-DD")
+        sub.add_argument("--until", help="结束日期 YYYY-MM-DD")
+        sub.add_argument("--status", choices=["success", "failed", "interrupted", "skipped", "unknown"], help="按状态筛选")
+    show = subparsers.add_parser("show", help="输出某次运行的原始日志")
+    show.add_argument("number", type=int, help="runs列出的运行编号")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not os.path.isfile(args.log):
+        print(f"日志文件不存在: {args.log}")
+        sys.exit(1)
+    indexer = LogIndexer(args.log, args.index)
+    added = indexer.update()
+    if args.command == "update":
+        print(f"索引已更新，新增 {added} 次运行，共 {len(indexer.state['runs'])} 次")
+        return
+    if args.command == "show":
+        if not 0 <= args.number < len(indexer.state["runs"]):
+            print(f"运行编号不存在: {args.number}")
+            return
+        print(indexer.read_run(indexer.state["runs"][args.number]))
+        return
+
+    numbered = indexer.runs(args.since, args.until, args.status)
+    if args.command == "runs":
+        print_runs(numbered)
+    elif args.command == "daily":
+        print_daily(numbered)
+    else:
+        print_stats(numbered)
+
+
+if __name__ == "__main__":
+    main()
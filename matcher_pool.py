@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+# 工作进程内常驻的模板（进程初始化时加载一次，之后不再传输）
+_worker_templates = {}
+
+
+def _load_template(path, scales):
+    """加载模板并生成各缩放比例的版本"""
+    image = cv2.imread(path)
+    if image is None:
+        return None
+    variants = []
+    for scale in scales:
+        if scale == 1.0:
+            variants.append((scale, image))
+        else:
+            height, width = image.shape[:2]
+            new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            variants.append((scale, cv2.resize(image, new_size)))
+    return variants
+
+
+def _init_worker(template_paths, scales):
+    """工作进程初始化：加载全部模板常驻内存"""
+    # 每个进程只用一个OpenCV线程，避免和其他工作进程抢占CPU
+    cv2.setNumThreads(1)
+    for path in template_paths:
+        variants = _load_template(path, scales)
+        if variants is not None:
+            _worker_templates[path] = variants
+
+
+def _match_in_worker(shm_name, shape, dtype, template_path, threshold):
+    """在工作进程中对共享内存里的帧执行一个模板的匹配
+
+    Returns:
+        (模板路径, 最高匹配度, 中心坐标或None)
+    """
+    variants = _worker_templates.get(template_path)
+    if variants is None:
+        return template_path, 0.0, None
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # 直接在共享内存上构造数组视图，不复制、不序列化
+        frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        frame_height, frame_width = frame.shape[:2]
+
+        best_score = 0.0
+        best_position = None
+        for _, target in variants:
+            target_height, target_width = target.shape[:2]
+            if target_height > frame_height or target_width > frame_width:
+                continue
+            result = cv2.matchTemplate(frame, target, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, _ = cv2.minMaxLoc(result)
+            if max_val <= best_score:
+                continue
+            # 未达标时也保留最高分数，供失败记录使用
+            best_score = float(max_val)
+            if max_val < threshold:
+                continue
+            # 与单线程实现保持一致：取最左上角的第一个达标位置
+            locations = np.where(result >= threshold)
+            top_left = (int(locations[1][0]), int(locations[0][0]))
+            best_position = (top_left[0] + target_width // 2, top_left[1] + target_height // 2)
+        # 释放数组视图后才能关闭共享内存
+        del frame
+        return template_path, best_score, best_position
+    finally:
+        shm.close()
+
+
+class MatcherPool:
+    """多进程模板匹配池
+
+    每帧截图只写入一次共享内存，工作进程直接映射读取；
+    模板在工作进程启动时加载并常驻，多个模板并行匹配。
+    """
+
+    def __init__(self, template_paths, scales=(1.0,), processes=None):
+        """
+        :param template_paths: 需要常驻的模板路径列表
+        :param scales: 模板缩放比例列表，用于多尺度匹配
+        :param processes: 工作进程数，默认使用CPU核心数
+        """
+        # 统一路径写法：Windows上glob返回fig\xxx.png，而调用方使用fig/xxx.png
+        self.template_paths = [os.path.normpath(path) for path in template_paths]
+        self.scales = tuple(scales)
+        self.processes = processes or os.cpu_count() or 1
+        self._shm = None
+        self._pool = multiprocessing.get_context("spawn").Pool(
+            processes=self.processes,
+            initializer=_init_worker,
+            initargs=(self.template_paths, self.scales),
+        )
+
+    def _put_frame(self, frame):
+        """把帧复制到共享内存，容量不足时重新分配"""
+        frame = np.ascontiguousarray(frame)
+        if self._shm is None or self._shm.size < frame.nbytes:
+            self._release_shm()
+            self._shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        shared = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._shm.buf)
+        shared[...] = frame
+        del shared
+        return frame.shape, frame.dtype.str
+
+    def match(self, frame, template_paths=None, threshold=0.8):
+        """对一帧并行匹配多个模板
+
+        Args:
+            frame: OpenCV图像（BGR数组）
+            template_paths: 需要匹配的模板，默认匹配全部常驻模板
+            threshold: 匹配阈值，0-1之间
+
+        Returns:
+            {模板路径: 中心坐标(x, y)或None}
+        """
+        return {path: position for path, (_, position) in self.match_scored(frame, template_paths, threshold).items()}
+
+    def match_scored(self, frame, template_paths=None, threshold=0.8):
+        """与match相同，同时返回每个模板的最高匹配度
+
+        Returns:
+            {模板路径: (最高匹配度, 中心坐标(x, y)或None)}，键与传入的路径写法一致
+        """
+        if self._pool is None:
+            raise RuntimeError("匹配池已关闭")
+        paths = self.template_paths if template_paths is None else list(template_paths)
+        missing = [path for path in paths if os.path.normpath(path) not in self.template_paths]
+        if missing:
+            raise ValueError(f"模板未在匹配池中注册: {missing}")
+
+        shape, dtype = self._put_frame(frame)
+        tasks = [(self._shm.name, shape, dtype, os.path.normpath(path), threshold) for path in paths]
+        results = self._pool.starmap(_match_in_worker, tasks)
+        return {path: (score, position) for path, (_, score, position) in zip(paths, results)}
+
+    def _release_shm(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def close(self):
+        """关闭工作进程并释放共享内存"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._release_shm()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,154 @@
+import collections
+import contextlib
+import cProfile
+import datetime
+import os
+import sys
+import threading
+import tracemalloc
+
+
+class StackSampler(threading.Thread):
+    """采样式分析器：定时抓取目标线程的调用栈，输出flamegraph.pl/speedscope可读的折叠栈格式"""
+
+    def __init__(self, thread_id, interval=0.005):
+        """
+        :param thread_id: 被采样线程的ident
+        :param interval: 采样间隔（秒）
+        """
+        super().__init__(name="StackSampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = collections.Counter()  # 折叠栈 -> 采样次数
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write(self, path):
+        """写出折叠栈文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RunProfiler:
+    """签到运行的性能分析开关
+
+    mode为"cprofile"时输出.prof（可用snakeviz、pstats查看），
+    为"sample"时输出.folded折叠栈（可直接生成火焰图）；
+    trace_memory开启时额外用tracemalloc输出内存分配Top-N报告。
+    stage为None时分析整个运行，否则只分析指定阶段。
+    """
+
+    def __init__(self, mode=None, stage=None, trace_memory=False, output_dir=".", top_n=20,
+                 sample_interval=0.005):
+        """
+        :param mode: None、"cprofile"或"sample"
+        :param stage: 只分析的阶段名称，None表示整个运行
+        :param trace_memory: 是否记录tracemalloc快照
+        :param output_dir: 结果输出目录
+        :param top_n: 内存分配报告的条数
+        :param sample_interval: 采样模式的采样间隔（秒）
+        """
+        if mode not in (None, "cprofile", "sample"):
+            raise ValueError(f"不支持的性能分析模式: {mode}")
+        self.mode = mode
+        self.stage_name = stage
+        self.trace_memory = trace_memory
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self._stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._attempts = collections.Counter()  # 每个阶段被分析的次数，恢复后重跑的阶段不覆盖之前的结果
+
+    @property
+    def enabled(self):
+        return self.mode is not None or self.trace_memory
+
+    def run(self):
+        """包住整个运行；指定了阶段时不做任何事"""
+        if self.stage_name is None:
+            return self._profile("run")
+        return contextlib.nullcontext()
+
+    def stage(self, name):
+        """包住单个阶段；只有与指定阶段同名时才分析"""
+        if self.stage_name == name:
+            return self._profile(name)
+        return contextlib.nullcontext()
+
+    def _output_path(self, label, suffix):
+        attempt = self._attempts[label]
+        name = f"profile_{self._stamp}_{label}" + (f"_{attempt}" if attempt > 1 else "")
+        return os.path.join(self.output_dir, name + suffix)
+
+    @contextlib.contextmanager
+    def _profile(self, label):
+        if not self.enabled:
+            yield
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._attempts[label] += 1
+        profiler = None
+        sampler = None
+        started_tracemalloc = False
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+        elif self.mode == "sample":
+            sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracemalloc = True
+
+        if sampler is not None:
+            sampler.start()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                path = self._output_path(label, ".prof")
+                profiler.dump_stats(path)
+                print(f"性能分析结果已保存到 {path}")
+            if sampler is not None:
+                sampler.stop()
+                path = self._output_path(label, ".folded")
+                sampler.write(path)
+                print(f"采样结果已保存到 {path}（{sum(sampler.samples.values())}次采样）")
+            if self.trace_memory:
+                self._write_allocation_report(label)
+                if started_tracemalloc:
+                    tracemalloc.stop()
+
+    def _write_allocation_report(self, label):
+        """写出tracemalloc内存分配Top-N报告"""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        path = self._output_path(label, "_alloc.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"当前内存: {current / 1024 / 1024:.1f} MiB，峰值: {peak / 1024 / 1024:.1f} MiB\n")
+            f.write(f"内存分配Top {self.top_n}（按代码行）:\n")
+            for index, stat in enumerate(snapshot.statistics("lineno")[:self.top_n], 1):
+                frame = stat.traceback[0]
+                f.write(f"{index:>3}. {frame.filename}:{frame.lineno} "
+                        f"{stat.size / 1024:.1f} KiB，{stat.count}次分配\n")
+        print(f"内存分配报告已保存到 {path}")
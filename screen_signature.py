@@ -0,0 +1,62 @@
+import numpy as np
+
+
+class ScreenSignature:
+    """模板颜色签名预筛选
+
+    每个模板预先计算一个粗粒度颜色直方图（每通道bins级），匹配前先与截图的直方图比较：
+    模板是截图的一部分，模板里的每种颜色截图中至少要有同样多的像素。
+    加载画面、黑屏等明显不含模板的帧可以在完整模板匹配之前直接排除。
+    """
+
+    def __init__(self, bins=8, step=4, min_coverage=0.5):
+        """
+        :param bins: 每个颜色通道的量化级数
+        :param step: 采样步长，按该间隔隔行隔列取像素
+        :param min_coverage: 模板像素中能在截图里找到同色像素的最低比例，低于该值则排除
+        """
+        self.bins = bins
+        self.step = step
+        self.min_coverage = min_coverage
+        self._shift = 8 - int(np.log2(bins))
+        self._template_signatures = {}  # 模板路径 -> 模板直方图
+        self._last_frame = None
+        self._last_frame_signature = None
+
+    def _histogram(self, image):
+        """对采样后的图像计算量化颜色直方图"""
+        sampled = image[::self.step, ::self.step]
+        if sampled.ndim == 2:
+            sampled = np.repeat(sampled[:, :, np.newaxis], 3, axis=2)
+        quantized = (sampled[:, :, :3] >> self._shift).astype(np.int32)
+        index = (quantized[:, :, 0] * self.bins + quantized[:, :, 1]) * self.bins + quantized[:, :, 2]
+        histogram = np.bincount(index.ravel(), minlength=self.bins ** 3)
+        return histogram.reshape(self.bins, self.bins, self.bins)
+
+    def template_signature(self, template_path, template):
+        """取出（必要时计算）模板签名"""
+        signature = self._template_signatures.get(template_path)
+        if signature is None or signature[1] != template.shape:
+            signature = (self._histogram(template), template.shape)
+            self._template_signatures[template_path] = signature
+        return signature[0]
+
+    def frame_signature(self, frame):
+        """计算截图签名；同一帧重复查询多个模板时只计算一次"""
+        if frame is not self._last_frame:
+            self._last_frame = frame
+            self._last_frame_signature = self._histogram(frame)
+        return self._last_frame_signature
+
+    def coverage(self, frame, template_path, template):
+        """模板颜色在截图中能被覆盖的比例，0-1之间"""
+        template_hist = self.template_signature(template_path, template)
+        total = template_hist.sum()
+        if total == 0:
+            return 1.0
+        frame_hist = self.frame_signature(frame)
+        return float(np.minimum(template_hist, frame_hist).sum()) / float(total)
+
+    def may_contain(self, frame, template_path, template):
+        """判断截图是否可能包含模板，False表示可以直接跳过完整匹配"""
+        return self.coverage(frame, template_path, template) >= self.min_coverage
@@ -0,0 +1,45 @@
+import json
+
+from checkpoint import RunCheckpoint
+
+
+def test_progress_survives_reload(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = RunCheckpoint(path)
+    checkpoint.mark_done("launch_game")
+    checkpoint.mark_done("click_game")
+    assert RunCheckpoint(path).completed == ["launch_game", "click_game"]
+
+
+def test_discard(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = RunCheckpoint(path)
+    for stage in ("launch_game", "click_game", "close_notice"):
+        checkpoint.mark_done(stage)
+    checkpoint.discard(["launch_game", "click_game"])
+    assert checkpoint.completed == ["close_notice"]
+    # 撤销结果同样落盘
+    assert RunCheckpoint(path).completed == ["close_notice"]
+    assert checkpoint.first_unfinished(["launch_game", "close_notice"]) == "launch_game"
+
+
+def test_new_day_clears_progress(tmp_path, monkeypatch):
+    path = str(tmp_path / "checkpoint.json")
+    monkeypatch.setattr(RunCheckpoint, "_today", staticmethod(lambda: "2025-08-17"))
+    checkpoint = RunCheckpoint(path)
+    checkpoint.mark_done("close_notice")
+    assert checkpoint.is_done("close_notice")
+
+    # 跨过零点：已加载的检查点和重新读取的检查点都视为未完成
+    monkeypatch.setattr(RunCheckpoint, "_today", staticmethod(lambda: "2025-08-18"))
+    assert not checkpoint.is_done("close_notice")
+    assert RunCheckpoint(path).completed == []
+
+
+def test_corrupt_file_starts_over(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text('{"day": "2025-08', encoding="utf-8")
+    checkpoint = RunCheckpoint(str(path))
+    assert checkpoint.completed == []
+    checkpoint.mark_done("launch_game")
+    assert json.loads(path.read_text(encoding="utf-8"))["completed"] == ["launch_game"]
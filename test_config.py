@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from config import ConfigError, ConfigWatcher, load_config
+
+
+def write_config(path, profiles, active_profile="default"):
+    path.write_text(json.dumps({"active_profile": active_profile, "profiles": profiles}), encoding="utf-8")
+    return str(path)
+
+
+def bump_mtime(path):
+    """同一秒内多次写入时mtime可能不变，手动推后"""
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+def test_extends_merges_nested_sections(tmp_path):
+    path = write_config(tmp_path / "config.json", {
+        "default": {"timeouts": {"stage": 60, "poll_interval": 0.5}, "capture": {"backend": "pull"}},
+        "fast": {"extends": "default", "timeouts": {"poll_interval": 0.2}},
+    })
+    config = load_config(path, "fast")
+    assert config.instance == "fast"
+    assert config.timeouts.poll_interval == 0.2
+    # 未覆盖的项从父配置档继承，而不是回到默认值
+    assert config.timeouts.stage == 60
+    assert config.capture.backend == "pull"
+
+
+@pytest.mark.parametrize("profiles, message", [
+    ({"default": {"timeouts": {"stage": float("nan")}}}, "profiles.default.timeouts.stage"),
+    ({"default": {"matching": {"threshold": float("inf")}}}, "profiles.default.matching.threshold"),
+    ({"default": {"extends": ["other"]}, "other": {}}, "profiles.default.extends"),
+    ({"default": {"extends": "other"}, "other": {"extends": "default"}}, "继承"),
+    ({"default": {"timeouts": {"stgae": 60}}}, "stgae"),
+    ({"default": {"matching": {"thresholds": {"fig/not_there.png": 0.9}}}}, "fig/not_there.png"),
+])
+def test_invalid_config_rejected(tmp_path, profiles, message):
+    path = write_config(tmp_path / "config.json", profiles)
+    with pytest.raises(ConfigError, match=message):
+        load_config(path)
+
+
+def test_thresholds_resolved_next_to_config(tmp_path):
+    (tmp_path / "fig").mkdir()
+    (tmp_path / "fig" / "target.png").write_bytes(b"")
+    path = write_config(tmp_path / "config.json",
+                        {"default": {"matching": {"thresholds": {"fig/target.png": 0.9}}}})
+    assert load_config(path).matching.threshold_for("fig/target.png") == 0.9
+
+
+def test_watcher_keeps_previous_config_on_bad_reload(tmp_path):
+    python_path = tmp_path / "python.exe"
+    python_path.write_bytes(b"")
+    runner = {"python_path": str(python_path), "target_script": str(python_path)}
+    path = write_config(tmp_path / "config.json", {"default": {"runner": dict(runner, schedule="04:15")}})
+    watcher = ConfigWatcher(path, required_paths=["runner.python_path", "runner.target_script"])
+    assert watcher.reload_if_changed() is False
+
+    write_config(tmp_path / "config.json", {"default": {"runner": dict(runner, schedule="05:30")}})
+    bump_mtime(path)
+    assert watcher.reload_if_changed() is True
+    assert watcher.config.runner.schedule == "05:30"
+
+    # 不合法的JSON：保留原配置，同一次修改只报告一次
+    (tmp_path / "config.json").write_text("{", encoding="utf-8")
+    bump_mtime(path)
+    with pytest.raises(ConfigError):
+        watcher.reload_if_changed()
+    assert watcher.reload_if_changed() is False
+    assert watcher.config.runner.schedule == "05:30"
+
+    # 结构合法但路径不存在，同样保留原配置
+    write_config(tmp_path / "config.json", {"default": {
+        "runner": dict(runner, python_path=str(tmp_path / "missing.exe"), schedule="06:00")}})
+    bump_mtime(path)
+    with pytest.raises(ConfigError, match="runner.python_path"):
+        watcher.reload_if_changed()
+    assert watcher.config.runner.schedule == "05:30"
+    assert watcher.config.runner.python_path == str(python_path)
@@ -0,0 +1,37 @@
+import os
+
+from log_index import LogIndexer, print_stats
+
+LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log.txt")
+
+
+def test_bundled_log_classification(tmp_path):
+    """固定随仓库附带的log.txt中每次运行的分类结果"""
+    indexer = LogIndexer(LOG_PATH, str(tmp_path / "log.txt.index.json"))
+    assert indexer.update() == 4
+
+    summary = [(run["start"][:16], run["status"], run["failing_stage"], run["connect_retries"])
+               for run in indexer.state["runs"]]
+    assert summary == [
+        # 调度器重启打断，没有脚本输出
+        ("2025-08-17 01:29", "interrupted", None, 0),
+        # 脚本输出整段乱码（实际运行到了是否退出），不能判定为失败
+        ("2025-08-17 01:52", "unknown", None, 0),
+        ("2025-08-17 01:57", "success", None, 3),
+        ("2025-08-17 04:15", "success", None, 3),
+    ]
+
+    # 再次更新只读取新增部分，结果不变
+    assert indexer.update() == 0
+    assert len(indexer.state["runs"]) == 4
+
+
+def test_stats_leave_unknown_runs_out_of_success_rate(tmp_path, capsys):
+    indexer = LogIndexer(LOG_PATH, str(tmp_path / "log.txt.index.json"))
+    indexer.update()
+    capsys.readouterr()
+    print_stats(indexer.runs())
+    output = capsys.readouterr().out
+    # 4次运行中1次无法识别，成功率按其余3次计算
+    assert "运行次数: 4，成功: 2（67%）" in output
+    assert "输出无法识别（如编码错误）: 1次" in output
@@ -0,0 +1,22 @@
+import os
+
+import cv2
+
+from matcher_pool import MatcherPool
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_lookup_with_forward_slash_path():
+    """注册时的路径写法（如Windows上glob返回的反斜杠）与查找时的fig/xxx.png不同也能匹配"""
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        frame = cv2.imread("screenshot.png")
+        with MatcherPool([os.path.join(".", "fig", "shiFouTuiChu.png")], processes=1) as pool:
+            results = pool.match_scored(frame, ["fig/shiFouTuiChu.png"])
+    finally:
+        os.chdir(cwd)
+    score, position = results["fig/shiFouTuiChu.png"]
+    assert position == (952, 465)
+    assert score > 0.99
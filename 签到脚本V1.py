@@ -1,13 +1,28 @@
+import argparse
+import glob
 import io
 import os
 import subprocess
 import sys
+import threading
 import time
 import cv2
 import numpy as np
 import psutil
 from PIL import Image
 import requests
+
+from checkpoint import STAGE_NAMES, RunCheckpoint
+from config import DEFAULT_CONFIG_PATH, Config, ConfigError, load_config
+from device_watchdog import STATE_DEVICE, STATE_OFFLINE, DeviceWatchdog
+from fft_matcher import FFTMatcher
+from flight_recorder import FlightRecorder
+from input_batch import InputSession
+from matcher_pool import MatcherPool
+from profiling_hooks import RunProfiler
+from screen_signature import ScreenSignature
+
+
 def is_connected_http(timeout=5, retry=2):
     """
     通过HTTP请求检测网络（验证能否正常访问互联网）
@@ -43,16 +58,38 @@ def is_connected_http(timeout=5, retry=2):
 
 
 class LDPlayerController:
-    def __init__(self, adb_path="D:/APP/LDPlayer9/adb.exe", device_name="LDPlayer", device_address="127.0.0.1:5555"):
-        """初始化LDPlayer控制器"""
-        self.adb_path = adb_path
-        self.device_name = device_name
-        self.device_address = device_address
-        self.screenshot_path = "screenshot.png"  # 截图保存路径
+    def __init__(self, adb_path=None, device_name=None, device_address=None,
+                 matcher_pool=None, fft_matcher=None, config=None):
+        """初始化LDPlayer控制器，未显式传入的参数取自config"""
+        self.config = config or Config()  # 运行配置
+        self.adb_path = adb_path or self.config.emulator.adb_path
+        self.device_name = device_name or self.config.emulator.device_name
+        self.device_address = device_address or self.config.emulator.device_address
+        self.screenshot_path = self.config.capture.screenshot_path  # 截图保存路径
         self.screen_width = None  # 屏幕宽度
         self.screen_height = None  # 屏幕高度
-        self.ldplayer_path = r"D:\APP\LDPlayer9\dnplayer.exe"  # 模拟器路径
+        self.ldplayer_path = self.config.emulator.ldplayer_path  # 模拟器路径
         self.max_retry = 5  # 最大重试次数
+        self.matcher_pool = matcher_pool  # 多进程模板匹配池，None时在主线程逐个匹配
+        self.fft_matcher = fft_matcher  # 频域批量匹配引擎，未设置匹配池时使用
+        if matcher_pool is None and fft_matcher is None:
+            if self.config.matching.engine == "pool":
+                self.matcher_pool = MatcherPool(glob.glob("fig/*.png"), processes=self.config.matching.pool_processes)
+            elif self.config.matching.engine == "fft":
+                self.fft_matcher = FFTMatcher()
+        self.adb_timeout = self.config.timeouts.adb_command  # 单条ADB命令超时时间（秒），避免subprocess无限挂起
+        self.device_wait_timeout = self.config.timeouts.device_wait  # 看门狗报告设备不可用时，命令等待设备恢复的最长时间（秒）
+        self.device_state = None  # 看门狗发布的设备状态，未启动看门狗时为None
+        self.device_ready = threading.Event()  # 设备在线时置位
+        self.watchdog = None  # 后台设备健康检查线程
+        # 常驻shell批量注入点击和按键
+        self.input = InputSession(self.adb_path, self.device_address, use_sendevent=self.config.input.use_sendevent)
+        self.recorder = FlightRecorder()  # 最近截图、匹配分数和命令的内存记录，阶段失败时写出
+        # 模板颜色签名预筛选，None时总是执行完整匹配
+        self.prefilter = ScreenSignature(min_coverage=self.config.matching.prefilter_min_coverage) \
+            if self.config.matching.prefilter else None
+        self._screenshot_cache = None  # (截图文件标识, 图像)，同一张截图只解码一次
+        self._template_cache = {}  # 模板路径 -> 模板图像
 
         # 连接设备
         self.connect_device()
@@ -64,19 +101,53 @@ class LDPlayerController:
         print("正在重启模拟器...")
         try:
             subprocess.run(["taskkill", "/f", "/im", "dnplayer.exe"],
-                           check=True, capture_output=True, text=True)
+                           check=True, capture_output=True, text=True, timeout=self.adb_timeout)
             print("成功关闭dnplayer.exe进程")
         except subprocess.CalledProcessError as e:
             print(f"关闭dnplayer.exe失败: {e}")
+        except subprocess.TimeoutExpired:
+            print(f"关闭dnplayer.exe超时（超过{self.adb_timeout}秒）")
 
         try:
             os.startfile(self.ldplayer_path)
             print("模拟器启动命令已发送")
-            # 等待20秒
-            time.sleep(20)
+            # 等待模拟器启动
+            time.sleep(self.config.emulator.restart_wait)
         except Exception as e:
             print(f"启动模拟器失败: {e}")
 
+    def set_device_state(self, state):
+        """发布设备状态（由看门狗线程调用）"""
+        if state != self.device_state:
+            print(f"设备状态: {self.device_state} -> {state}")
+        self.device_state = state
+        if state == STATE_DEVICE:
+            self.device_ready.set()
+        else:
+            self.device_ready.clear()
+
+    def start_watchdog(self, interval=5):
+        """启动后台设备健康检查"""
+        self.stop_watchdog()
+        self.watchdog = DeviceWatchdog(self, interval=interval)
+        self.watchdog.start()
+
+    def stop_watchdog(self):
+        """停止后台设备健康检查"""
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog = None
+            self.device_state = None
+            self.device_ready.clear()
+
+    def shutdown(self):
+        """停止看门狗、关闭输入会话和匹配池（模拟器重启或运行结束时调用）"""
+        self.stop_watchdog()
+        self.input.close()
+        if self.matcher_pool is not None:
+            self.matcher_pool.close()
+            self.matcher_pool = None
+
     def wait_for_emulator_to_start(self, timeout=60):
         """等待模拟器启动完成"""
         print("等待模拟器启动...")
@@ -102,15 +173,29 @@ class LDPlayerController:
             else:
                 full_command = [self.adb_path] + command
 
+            # 看门狗已报告设备不可用时，等待其后台重连，超时则快速失败
+            if device_specific and self.watchdog is not None and not self.device_ready.is_set():
+                if not self.device_ready.wait(self.device_wait_timeout):
+                    print(f"设备不可用({self.device_state})，跳过ADB命令: {' '.join(command)}")
+                    return None
+
+            self.recorder.record_command(command)
             # 执行命令，指定编码为utf-8并忽略解码错误
             result = subprocess.run(full_command, capture_output=True, text=True,
-                                    encoding='utf-8', errors='ignore', check=True)
+                                    encoding='utf-8', errors='ignore', check=True, timeout=self.adb_timeout)
             return result.stdout.strip()
+        except subprocess.TimeoutExpired:
+            print(f"ADB命令执行超时（超过{self.adb_timeout}秒）: {' '.join(command)}")
+            return None
         except subprocess.CalledProcessError as e:
             error_message = f"ADB命令执行失败: {e.stderr}"
             print(error_message)
             # 检查是否是设备离线错误
-            if "error: device offline" in e.stderr:
+            if "error: device offline" in e.stderr and self.watchdog is not None:
+                # 交给看门狗在后台重连，主流程不在这里阻塞
+                print("检测到设备离线，等待看门狗重连...")
+                self.set_device_state(STATE_OFFLINE)
+            elif "error: device offline" in e.stderr:
                 print("检测到设备离线，正在重启模拟器...")
                 self.restart_emulator()
                 if self.wait_for_emulator_to_start():
@@ -120,10 +205,13 @@ class LDPlayerController:
                         print("重新执行ADB命令...")
                         try:
                             result = subprocess.run(full_command, capture_output=True, text=True,
-                                                    encoding='utf-8', errors='ignore', check=True)
+                                                    encoding='utf-8', errors='ignore', check=True,
+                                                    timeout=self.adb_timeout)
                             return result.stdout.strip()
                         except subprocess.CalledProcessError as retry_e:
                             print(f"重试ADB命令失败: {retry_e.stderr}")
+                        except subprocess.TimeoutExpired:
+                            print(f"重试ADB命令超时（超过{self.adb_timeout}秒）")
             return None
         except Exception as e:
             print(f"执行ADB命令时发生错误: {str(e)}")
@@ -181,15 +269,21 @@ class LDPlayerController:
         """截取屏幕并保存到本地"""
         try:
             print("正在截取屏幕...")
-            # 使用ADB命令截图并保存到设备
-            device_screenshot_path = "/sdcard/screenshot.png"
-            self.run_adb_command(["shell", "screencap", "-p", device_screenshot_path])
+            if self.config.capture.backend == "exec_out":
+                # 直接读取PNG字节，省去设备端写文件、pull和rm三次ADB调用
+                if not self.exec_out_screencap():
+                    return False
+            else:
+                # 使用ADB命令截图并保存到设备
+                device_screenshot_path = "/sdcard/screenshot.png"
+                self.run_adb_command(["shell", "screencap", "-p", device_screenshot_path])
 
-            # 将截图从设备拉取到本地
-            self.run_adb_command(["pull", device_screenshot_path, self.screenshot_path])
+                # 将截图从设备拉取到本地
+                self.run_adb_command(["pull", device_screenshot_path, self.screenshot_path])
 
-            # 删除设备上的截图
-            self.run_adb_command(["shell", "rm", device_screenshot_path])
+                # 删除设备上的截图
+                self.run_adb_command(["shell", "rm", device_screenshot_path])
+            self._screenshot_cache = None
 
             print(f"截图已保存到 {self.screenshot_path}")
             return True
@@ -197,12 +291,38 @@ class LDPlayerController:
             print(f"截图失败: {str(e)}")
             return False
 
+    def exec_out_screencap(self):
+        """通过adb exec-out截图并写入本地截图文件"""
+        command = ["exec-out", "screencap", "-p"]
+        self.recorder.record_command(command)
+        try:
+            result = subprocess.run([self.adb_path, "-s", self.device_address] + command,
+                                    capture_output=True, check=True, timeout=self.adb_timeout)
+        except subprocess.TimeoutExpired:
+            print(f"ADB命令执行超时（超过{self.adb_timeout}秒）: {' '.join(command)}")
+            return False
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"截图失败: {e}")
+            return False
+        if not result.stdout.startswith(b"\x89PNG"):
+            print("截图失败: 返回的数据不是PNG")
+            return False
+        with open(self.screenshot_path, "wb") as f:
+            f.write(result.stdout)
+        return True
+
     def load_screenshot(self):
         """加载截图为OpenCV图像对象，处理分辨率变化"""
         if not os.path.exists(self.screenshot_path):
             print("截图文件不存在，请先执行截图")
             return None
 
+        # 同一张截图查找多个目标时复用已解码的图像
+        stat = os.stat(self.screenshot_path)
+        cache_key = (stat.st_mtime_ns, stat.st_size, self.screen_width, self.screen_height)
+        if self._screenshot_cache is not None and self._screenshot_cache[0] == cache_key:
+            return self._screenshot_cache[1]
+
         # 使用OpenCV读取图像
         image = cv2.imread(self.screenshot_path)
         if image is None:
@@ -223,32 +343,53 @@ class LDPlayerController:
                 print(f"调整图像大小时出错: {e}")
                 return None
 
+        self._screenshot_cache = (cache_key, image)
+        self.recorder.record_frame(image)
         return image
 
-    def find_image_in_screenshot(self, target_image_path, threshold=0.8):
+    def load_template(self, target_image_path):
+        """加载目标图像，加载过的模板直接从缓存返回
+
+        Returns:
+            OpenCV图像对象，不存在或无法加载时返回None
+        """
+        if target_image_path in self._template_cache:
+            return self._template_cache[target_image_path]
+
+        # 检查目标图像是否存在
+        if not os.path.exists(target_image_path):
+            print(f"目标图像不存在: {target_image_path}")
+            return None
+
+        target = cv2.imread(target_image_path)
+        if target is None:
+            print(f"无法加载目标图像: {target_image_path}")
+            return None
+        self._template_cache[target_image_path] = target
+        return target
+
+    def find_image_in_screenshot(self, target_image_path, threshold=None):
         """在截图中查找目标图像
 
         Args:
             target_image_path: 目标图像路径
-            threshold: 匹配阈值，0-1之间，值越高匹配度要求越严格
+            threshold: 匹配阈值，0-1之间，值越高匹配度要求越严格；None时取配置中该模板的阈值
 
         Returns:
             找到的位置坐标(x, y)，如果未找到返回None
         """
+        # 单个模板没有可并行或共摊的部分，无论配置了哪种匹配引擎都在当前进程匹配
+        if threshold is None:
+            threshold = self.config.matching.threshold_for(target_image_path)
+
         # 加载截图
         screenshot = self.load_screenshot()
         if screenshot is None:
             return None
 
-        # 检查目标图像是否存在
-        if not os.path.exists(target_image_path):
-            print(f"目标图像不存在: {target_image_path}")
-            return None
-
         # 加载目标图像
-        target = cv2.imread(target_image_path)
+        target = self.load_template(target_image_path)
         if target is None:
-            print(f"无法加载目标图像: {target_image_path}")
             return None
 
         # 获取目标图像和截图的尺寸
@@ -274,8 +415,28 @@ class LDPlayerController:
                 # 重新获取尺寸
                 target_height, target_width = target.shape[:2]
 
+        # 颜色签名预筛选，明显不包含目标的截图（黑屏、加载画面）直接跳过完整匹配
+        if self.prefilter is not None and not self.prefilter.may_contain(screenshot, target_image_path, target):
+            print("未找到目标图像（颜色预筛选排除）")
+            self.recorder.record_note(f"预筛选排除: {target_image_path}")
+            return None
+
+        return self.match_template(screenshot, target_image_path, target, threshold)
+
+    def match_template(self, screenshot, target_image_path, target, threshold):
+        """在当前进程中用cv2.matchTemplate匹配单个模板
+
+        Returns:
+            找到的位置坐标(x, y)，如果未找到返回None
+        """
+        target_height, target_width = target.shape[:2]
+        if target_height > screenshot.shape[0] or target_width > screenshot.shape[1]:
+            print("未找到目标图像（目标图像大于截图）")
+            return None
+
         # 使用模板匹配查找目标图像
         result = cv2.matchTemplate(screenshot, target, cv2.TM_CCOEFF_NORMED)
+        _, max_score, _, _ = cv2.minMaxLoc(result)
 
         # 找到匹配度超过阈值的位置
         locations = np.where(result >= threshold)
@@ -290,11 +451,82 @@ class LDPlayerController:
             center_y = top_left[1] + target_height // 2
 
             print(f"在位置 ({center_x}, {center_y}) 找到目标图像")
+            self.recorder.record_score(target_image_path, max_score, (center_x, center_y))
             return (center_x, center_y)
         else:
             print("未找到目标图像")
+            self.recorder.record_score(target_image_path, max_score)
             return None
 
+    def find_images_in_screenshot(self, target_image_paths, threshold=None):
+        """在同一张截图中查找多个目标图像
+
+        设置了matcher_pool时由多进程匹配池并行匹配，设置了fft_matcher时在频域批量匹配，
+        否则（或通过预筛选的只剩一个模板时）逐个匹配
+
+        Args:
+            target_image_paths: 目标图像路径列表
+            threshold: 匹配阈值，0-1之间；None时按配置取各模板的阈值
+
+        Returns:
+            {目标图像路径: 中心坐标(x, y)或None}
+        """
+        if self.matcher_pool is None and self.fft_matcher is None:
+            return {path: self.find_image_in_screenshot(path, threshold) for path in target_image_paths}
+
+        positions = {path: None for path in target_image_paths}
+        screenshot = self.load_screenshot()
+        if screenshot is None:
+            return positions
+
+        # 只把通过颜色签名预筛选的模板交给完整匹配
+        candidates = []
+        for path in target_image_paths:
+            target = self.load_template(path)
+            if target is None:
+                continue
+            if self.prefilter is None or self.prefilter.may_contain(screenshot, path, target):
+                candidates.append(path)
+        if not candidates:
+            return positions
+        # 只剩一个模板时没有可并行或共摊的部分，直接在当前进程匹配，省去共享内存复制和进程间通信
+        if len(candidates) == 1:
+            path = candidates[0]
+            value = threshold if threshold is not None else self.config.matching.threshold_for(path)
+            positions[path] = self.match_template(screenshot, path, self.load_template(path), value)
+            return positions
+
+        # 阈值相同的模板放在同一批匹配
+        groups = {}
+        for path in candidates:
+            value = threshold if threshold is not None else self.config.matching.threshold_for(path)
+            groups.setdefault(value, []).append(path)
+
+        for value, paths in groups.items():
+            if self.matcher_pool is not None:
+                results = self.matcher_pool.match_scored(screenshot, paths, value)
+            else:
+                for path in paths:
+                    if path not in self.fft_matcher.templates:
+                        self.fft_matcher.register(path, self.load_template(path))
+                results = self.fft_matcher.find_all_scored(screenshot, paths, value)
+            for path, (score, position) in results.items():
+                self.recorder.record_score(path, score, position)
+                positions[path] = position
+        return positions
+
+    def classify_screen(self, target_image_paths, threshold=None):
+        """根据截图判断当前所处界面
+
+        Returns:
+            (第一个匹配的目标图像路径, 中心坐标)，都未匹配时返回(None, None)
+        """
+        positions = self.find_images_in_screenshot(target_image_paths, threshold)
+        for path in target_image_paths:
+            if positions.get(path):
+                return path, positions[path]
+        return None, None
+
     def perform_click(self, position):
         """执行点击操作
 
@@ -317,9 +549,29 @@ class LDPlayerController:
 
         print(f"执行点击操作: ({x}, {y})")
 
-        # 执行ADB点击命令
-        result = self.run_adb_command(["shell", f"input tap {x} {y}"])
-        return result is not None
+        # 通过常驻shell执行点击
+        self.input.screen_size = (self.screen_width, self.screen_height)
+        self.input.tap(x, y)
+        self.recorder.record_command(f"tap {x} {y}")
+        return self.flush_input()
+
+    def press_key(self, keycode):
+        """通过常驻shell发送按键，如KEYCODE_BACK
+
+        Returns:
+            操作是否成功
+        """
+        self.input.keyevent(keycode)
+        self.recorder.record_command(f"keyevent {keycode}")
+        return self.flush_input()
+
+    def flush_input(self):
+        """发送输入队列中的事件，看门狗报告设备不可用时快速失败"""
+        if self.watchdog is not None and not self.device_ready.wait(self.device_wait_timeout):
+            print(f"设备不可用({self.device_state})，丢弃输入事件")
+            self.input.clear()
+            return False
+        return self.input.flush()
 
     def click_center(self):
         """点击屏幕中心位置
@@ -338,23 +590,38 @@ class LDPlayerController:
         return self.perform_click((center_x, center_y))
 
 
-def main():
+CHECKPOINT_PATH = "checkpoint.json"  # 签到进度检查点文件
+
+
+class StageTimeout(Exception):
+    """阶段执行超时，需要重启模拟器恢复"""
+
+    def __init__(self, stage):
+        super().__init__(f"阶段 {stage} 执行超时")
+        self.stage = stage
+
+
+def prepare_controller(config):
+    """清理残留进程、重启模拟器并连接设备
+
+    Returns:
+        连接成功的控制器，连接失败返回None（由sign_in重启模拟器后重试）
+    """
     close_ldplayer_service()
     find_and_kill_port(5555)
     close_ldplayer_processes()
     # 写一个脚本检测是否可以ping通baidu.com,不能的话直接return
     if not is_connected_http:
-        return
+        return None
     else:
         print("有网络")
 
     # 创建控制器实例
-    controller = LDPlayerController()
+    controller = LDPlayerController(config=config)
     controller.restart_emulator()
-    isHome = False
     isADB = False
 
-    # 检测ADB连接状态,5次失败尝试关闭进程dnplayer.exe并重新启动模拟器
+    # 检测ADB连接状态,5次失败后再等待模拟器启动一次，仍失败则交给sign_in重启模拟器重试
     retry_count = 0
 
     # 初始连接检查
@@ -371,36 +638,21 @@ def main():
                 else:
                     print("未连接ADB，请检查LDPlayer是否已启动")
                     retry_count += 1
-                    if retry_count >= controller.max_retry:
-                        main()
-                        # 等待模拟器启动
-                        print("等待模拟器启动...")
-                        if controller.wait_for_emulator_to_start():
-                            break
             else:
                 print("ADB命令执行失败")
                 retry_count += 1
-                if retry_count >= controller.max_retry:
-                    main()
-                    # 等待模拟器启动
-                    print("等待模拟器启动...")
-                    if controller.wait_for_emulator_to_start():
-                        break
         except Exception as e:
             print(f"ADB命令执行异常: {e}")
             retry_count += 1
-            if retry_count >= controller.max_retry:
-                main()
-                # 等待模拟器启动
-                print("等待模拟器启动...")
-                if controller.wait_for_emulator_to_start():
-                    break
 
         if not isADB and retry_count < controller.max_retry:
             time.sleep(2)  # 增加等待时间
 
-    if not isADB:
+    # 等待模拟器启动
+    if not isADB and not controller.wait_for_emulator_to_start():
         print("ADB连接失败，已达到最大重试次数")
+        controller.shutdown()
+        return None
 
     # while not isADB:
     #     result = controller.run_adb_command(["devices"])
@@ -411,171 +663,271 @@ def main():
     #         print("未连接ADB，请检查LDPlayer是否已启动")
     #         time.sleep(1)
 
-    if controller.connect_device():
-        # 等待设备完全启动并重新获取屏幕分辨率
-        if controller.wait_for_device():
-            # 重新获取屏幕分辨率
-            if not controller.get_screen_resolution():
-                print("无法获取设备屏幕分辨率")
-            else:
-                print(f"设备屏幕分辨率: {controller.screen_width}x{controller.screen_height}")
-
-        while not isHome:
+    if not controller.connect_device():
+        controller.shutdown()
+        return None
+    # 等待设备完全启动并重新获取屏幕分辨率
+    if controller.wait_for_device():
+        # 重新获取屏幕分辨率
+        if not controller.get_screen_resolution():
+            print("无法获取设备屏幕分辨率")
+        else:
+            print(f"设备屏幕分辨率: {controller.screen_width}x{controller.screen_height}")
+    # 之后由看门狗在后台检查设备状态并重连
+    if config.watchdog.enabled:
+        controller.start_watchdog(config.watchdog.interval)
+    return controller
+
+
+def stage_launch_game(controller):
+    """回到桌面并启动FGO"""
+    home_path = "fig/Home_feature.png"
+    # 查找目标图像（fig文件夹下的fgo图标.png）
+    # target_path = os.path.join("fig", "fgoLogo.png")
+    target_path = "fig/fgoLogo.png"
+    while True:
+        controller.take_screenshot()
+        # 同一张截图同时查找home特征和fgo图标，进入home界面后不必再截图一次
+        positions = controller.find_images_in_screenshot([home_path, target_path])
+        # 如果能找到截取的图片screenshot.png中有home的特征fig/Home_feature.png则认为在home界面
+        if positions[home_path]:
+            print("已进入home界面")
+            break
+        print("未进入home界面，尝试返回home")
+        # 使用ADB的home键
+        controller.press_key("KEYCODE_HOME")
+        time.sleep(5)
+
+    target_position = positions[target_path]
+
+    print("点击fgo图标!!")
+    # 如果找到目标，执行点击
+    if target_position:
+        controller.perform_click(target_position)
+    # 等待fgo启动
+    time.sleep(controller.config.timeouts.game_launch)
+
+
+def stage_click_game(controller, timeout=None):
+    """每0.5秒检测一次是否在fig/clickgame.png界面,如果是,则点击,超时由main重启模拟器后恢复"""
+    timeout = timeout or controller.config.timeouts.stage
+    restart_count = 0
+    max_restarts = 3
+    start_time = time.time()
+
+    while True:
+        # 检查是否超时
+        if time.time() - start_time > timeout:
+            print("操作超时，重新重启模拟器")
+            raise StageTimeout("click_game")
+        try:
             controller.take_screenshot()
-            # 如果能找到截取的图片screenshot.png中有home的特征fig/Home_feature.png则认为在home界面
-            if controller.find_image_in_screenshot("fig/Home_feature.png"):
-                isHome = True
-                print("已进入home界面")
+            # 1. 获取“clickgame”的坐标（而非复用旧的target_position）；同时识别下一个界面，已越过本界面时不再空等
+            screen, clickgame_pos = controller.classify_screen(["fig/clickgame.png", "fig/clickScreen.png"])
+            if screen == "fig/clickScreen.png":
+                print("已出现请点击屏幕界面，无需点击游戏")
+                break
+            if clickgame_pos:  # 2. 若找到，使用新坐标点击
+                print("找到请点击游戏界面，执行点击...")
+                controller.perform_click(clickgame_pos)  # 此处用新坐标
+                print("等待加载...")
+                time.sleep(9)
+                break
             else:
-                print("未进入home界面，尝试返回home")
-                # 使用ADB的home键
-                controller.run_adb_command(["shell", "input keyevent KEYCODE_HOME"])
-                time.sleep(5)
-
-        # 截取屏幕
-        controller.take_screenshot()
-
-        # 查找目标图像（fig文件夹下的fgo图标.png）
-        # target_path = os.path.join("fig", "fgoLogo.png")
-        target_path = "fig/fgoLogo.png"
-        target_position = controller.find_image_in_screenshot(target_path)
-
-        print("点击fgo图标!!")
-        # 如果找到目标，执行点击
-        if target_position:
-            controller.perform_click(target_position)
-        # 等待fgo启动，40s
-        time.sleep(40)
-
-        # 之后每一秒检测一次是否在fig/clickgame.png界面,如果是,则点击,重试的总时间超过60s,重启模拟器,从头开始运行main
-        restart_count = 0
-        max_restarts = 3
-        start_time = time.time()
-        timeout = 120  # 60秒超时时间
-
-        while True:
-            # 检查是否超时
-            if time.time() - start_time > timeout:
-                print("操作超时，重新重启模拟器")
-                main()
-                if controller.wait_for_emulator_to_start():
-                    print("模拟器已重新启动，重新开始运行main")
-                    main()
-                    return
-            try:
-                controller.take_screenshot()
-                # 1. 获取“clickgame”的坐标（而非复用旧的target_position）
-                clickgame_pos = controller.find_image_in_screenshot("fig/clickgame.png")
-                if clickgame_pos:  # 2. 若找到，使用新坐标点击
-                    print("找到请点击游戏界面，执行点击...")
-                    controller.perform_click(clickgame_pos)  # 此处用新坐标
-                    print("等待加载...")
-                    time.sleep(9)
-                    break
-                else:
-                    print("未找到点击游戏界面，继续等待...")
-                    time.sleep(0.5)
-                    continue
-            except KeyboardInterrupt:
-                print("用户中断操作")
-                raise
-            except Exception as e:
-                print(f"执行过程中出现异常: {e}")
-                restart_count += 1
-                if restart_count > max_restarts:
-                    print("异常重启次数过多，终止操作")
-                    break
-                time.sleep(10)  # 短暂等待后重试
+                print("未找到点击游戏界面，继续等待...")
+                time.sleep(controller.config.timeouts.poll_interval)
                 continue
-        controller.take_screenshot()
-
-        # ========================================================================================================================
-        restart_count = 0
-        max_restarts = 3
-        start_time = time.time()
-
-        while True:
-            # 检查是否超时
-            if time.time() - start_time > timeout:
-                print("操作超时，重新重启模拟器")
-                main()
-                if controller.wait_for_emulator_to_start():
-                    print("模拟器已重新启动，重新开始运行main")
-                    main()
-                    return
-            try:
-                controller.take_screenshot()
-                # 1. 获取“clickgame”的坐标（而非复用旧的target_position）
-                pos = controller.find_image_in_screenshot("fig/clickScreen.png")
-                if pos:  # 2. 若找到，使用新坐标点击
-                    print("找到请点击屏幕，执行点击...")
-                    # 根据分辨率点击屏幕正中心
-                    controller.click_center()
-                    print("等待加载...")
-                    time.sleep(9)
-                    break
-                else:
-                    print("未找到点击屏幕，继续等待...")
-                    time.sleep(0.5)
-                    continue
-            except KeyboardInterrupt:
-                print("用户中断操作")
-                raise
-            except Exception as e:
-                print(f"执行过程中出现异常: {e}")
-                restart_count += 1
-                if restart_count > max_restarts:
-                    print("异常重启次数过多，终止操作")
-                    break
-                time.sleep(10)  # 短暂等待后重试
-                continue
-        controller.take_screenshot()
-        # ========================================================================================================================
-        #     截图,然后每秒钟识别一次"fig/gongGao.png",识别到则点击,设置最长时60秒
-        start_time = time.time()
-        while True:
-            # 检查是否超时
-            if time.time() - start_time > timeout:
-                print("操作超时，重新重启模拟器")
-                main()
-                if controller.wait_for_emulator_to_start():
-                    print("模拟器已重新启动，重新开始运行main")
-                    main()
-                    return
+        except KeyboardInterrupt:
+            print("用户中断操作")
+            raise
+        except Exception as e:
+            print(f"执行过程中出现异常: {e}")
+            restart_count += 1
+            if restart_count > max_restarts:
+                print("异常重启次数过多，终止操作")
+                return False
+            time.sleep(10)  # 短暂等待后重试
+            continue
+    controller.take_screenshot()
+
+
+def stage_click_screen(controller, timeout=None):
+    """等待“请点击屏幕”界面并点击屏幕中心"""
+    timeout = timeout or controller.config.timeouts.stage
+    restart_count = 0
+    max_restarts = 3
+    start_time = time.time()
+
+    while True:
+        # 检查是否超时
+        if time.time() - start_time > timeout:
+            print("操作超时，重新重启模拟器")
+            raise StageTimeout("click_screen")
+        try:
             controller.take_screenshot()
-            if controller.find_image_in_screenshot("fig/gongGao.png"):
-                print("找到公告，执行关闭...")
-                # 使用系统返回键
-                controller.run_adb_command(["shell", "input keyevent KEYCODE_BACK"])
+            # 1. 获取“clickgame”的坐标（而非复用旧的target_position）；同时识别公告，已越过本界面时不再空等
+            screen, pos = controller.classify_screen(["fig/clickScreen.png", "fig/gongGao.png"])
+            if screen == "fig/gongGao.png":
+                print("已出现公告，无需点击屏幕")
+                break
+            if pos:  # 2. 若找到，使用新坐标点击
+                print("找到请点击屏幕，执行点击...")
+                # 根据分辨率点击屏幕正中心
+                controller.click_center()
                 print("等待加载...")
-                time.sleep(5)
+                time.sleep(9)
                 break
             else:
-                print("未找到公告，继续等待...")
-                time.sleep(0.5)
-
-        # ========================================================================================================================
+                print("未找到点击屏幕，继续等待...")
+                time.sleep(controller.config.timeouts.poll_interval)
+                continue
+        except KeyboardInterrupt:
+            print("用户中断操作")
+            raise
+        except Exception as e:
+            print(f"执行过程中出现异常: {e}")
+            restart_count += 1
+            if restart_count > max_restarts:
+                print("异常重启次数过多，终止操作")
+                return False
+            time.sleep(10)  # 短暂等待后重试
+            continue
+    controller.take_screenshot()
+
+
+def stage_close_notice(controller, timeout=None):
+    """截图,然后每0.5秒识别一次"fig/gongGao.png",识别到则关闭；看到公告即已登录，当日签到完成"""
+    timeout = timeout or controller.config.timeouts.stage
+    start_time = time.time()
+    while True:
+        # 检查是否超时
+        if time.time() - start_time > timeout:
+            print("操作超时，重新重启模拟器")
+            raise StageTimeout("close_notice")
+        controller.take_screenshot()
+        if controller.find_image_in_screenshot("fig/gongGao.png"):
+            print("找到公告，执行关闭...")
+            # 使用系统返回键
+            controller.press_key("KEYCODE_BACK")
+            print("等待加载...")
+            time.sleep(5)
+            break
+        else:
+            print("未找到公告，继续等待...")
+            time.sleep(controller.config.timeouts.poll_interval)
+
+
+def stage_exit_game(controller, timeout=None):
+    """疯狂执行返回键直到出现是否退出；已签到完成，超时不再重启模拟器，返回False表示未能退出"""
+    timeout = timeout or controller.config.timeouts.stage
+    print("开始疯狂执行返回键,直到是否退出")
+    start_time = time.time()
+    while True:
+        # 检查是否超时
+        if time.time() - start_time > timeout:
+            print("操作超时!!")
+            return False
 
-        print("开始疯狂执行返回键,直到是否退出")
-        start_time = time.time()
-        while True:
-            # 检查是否超时
-            if time.time() - start_time > timeout:
-                print("操作超时!!")
+        controller.take_screenshot()
+        if controller.find_image_in_screenshot("fig/shiFouTuiChu.png"):
+            print("找到是否退出按钮!!!")
+            # 使用系统返回键
+            controller.press_key("KEYCODE_BACK")
+            print("等待加载...")
+            time.sleep(5)
+            break
+        else:
+            print("未找到是否退出按钮，继续返回!")
+            controller.press_key("KEYCODE_BACK")
+            time.sleep(controller.config.timeouts.poll_interval)
+
+
+# 各阶段的(执行函数, 是否依赖当前游戏会话)；执行函数返回False表示阶段未完成
+# 依赖游戏会话的阶段在模拟器重启后失效，需要重新执行
+STAGE_FUNCTIONS = {
+    "launch_game": (stage_launch_game, True),
+    "click_game": (stage_click_game, True),
+    "click_screen": (stage_click_screen, True),
+    "close_notice": (stage_close_notice, False),
+    "exit_game": (stage_exit_game, True),
+}
+# 签到流程的各阶段：(名称, 执行函数, 是否依赖当前游戏会话)，顺序与名称取自checkpoint.STAGE_NAMES
+STAGES = [(name,) + STAGE_FUNCTIONS[name] for name in STAGE_NAMES]
+SIGN_IN_STAGE = "close_notice"  # 完成该阶段即视为当日签到完成
+
+
+def run_stages(controller, checkpoint, profiler):
+    """从第一个未完成的阶段开始依次执行，每完成一个阶段写入检查点
+
+    Returns:
+        未完成的阶段名称，全部完成时返回None
+    """
+    for name, stage, _ in STAGES:
+        if checkpoint.is_done(name):
+            print(f"【阶段】跳过（今日已完成）: {name}")
+            continue
+        print(f"【阶段】开始: {name}")
+        controller.recorder.record_note(f"阶段开始: {name}")
+        with profiler.stage(name):
+            succeeded = stage(controller) is not False
+        if not succeeded:
+            # 阶段自行放弃（非超时），不写检查点，也不再继续后面的阶段
+            print(f"【阶段】未完成: {name}")
+            return name
+        checkpoint.mark_done(name)
+        print(f"【阶段】完成: {name}")
+    return None
+
+
+def main(profiler=None, config=None):
+    """签到入口，profiler用于开启整个运行或单个阶段的性能分析，config默认读取config.json"""
+    profiler = profiler or RunProfiler()
+    config = config or load_config()
+    with profiler.run():
+        sign_in(profiler, config)
+
+
+def sign_in(profiler, config):
+    checkpoint = RunCheckpoint(CHECKPOINT_PATH)
+    if checkpoint.is_done(SIGN_IN_STAGE):
+        print(f"今日({checkpoint.day})已完成签到，跳过本次运行")
+        return
 
-            controller.take_screenshot()
-            if controller.find_image_in_screenshot("fig/shiFouTuiChu.png"):
-                print("找到是否退出按钮!!!")
-                # 使用系统返回键
-                controller.run_adb_command(["shell", "input keyevent KEYCODE_BACK"])
-                print("等待加载...")
-                time.sleep(5)
+    session_stages = [name for name, _, in_session in STAGES if in_session]
+    recoveries = 0
+    while True:
+        controller = prepare_controller(config)
+        if controller is None:
+            print("模拟器准备失败，重启模拟器后重试")
+        else:
+            # 控制器总是对应刚重启的模拟器，游戏进程不复存在：无论上次是阶段超时，
+            # 还是进程被定时任务超时终止、手动中断或崩溃，依赖游戏会话的阶段都需要重做
+            checkpoint.discard(session_stages)
+            try:
+                failed_stage = run_stages(controller, checkpoint, profiler)
+                if failed_stage:
+                    controller.recorder.dump(failed_stage)
+                controller.shutdown()
+                close_dnplayer()
                 break
-            else:
-                print("未找到是否退出按钮，继续返回!")
-                controller.run_adb_command(["shell", "input keyevent KEYCODE_BACK"])
-                time.sleep(0.5)
-        close_dnplayer()
+            except StageTimeout as e:
+                # 只在阶段失败时把内存中的截图和事件写盘
+                controller.recorder.dump(e.stage)
+                controller.shutdown()
+                print(f"{e}，重启模拟器后从未完成的阶段继续")
+            except BaseException as e:
+                # 其他异常（包括手动中断）无法恢复：同样保存现场并关闭后台线程、输入会话和匹配池后再抛出
+                stage = checkpoint.first_unfinished([name for name, _, _ in STAGES]) or "run"
+                controller.recorder.dump(f"{stage}_{type(e).__name__}")
+                controller.shutdown()
+                raise
+        recoveries += 1
+        if recoveries > config.timeouts.max_recoveries:
+            print("恢复次数过多，终止操作")
+            close_dnplayer()
+            break
+        next_stage = next(name for name, _, in_session in STAGES if in_session or not checkpoint.is_done(name))
+        print(f"第{recoveries}次恢复，将从阶段 {next_stage} 继续")
     print("程序执行完毕")
 
 
@@ -727,5 +1079,37 @@ def close_ldplayer_processes():
     print("关闭Ld9BoxHeadless完成")
 
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="FGO国服自动签到")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="配置文件路径，默认为脚本目录下的config.json")
+    parser.add_argument("--instance", help="使用的配置档，默认为配置文件中的active_profile")
+    parser.add_argument("--profile", choices=["cprofile", "sample"],
+                        help="开启性能分析：cprofile输出.prof，sample输出火焰图折叠栈.folded")
+    parser.add_argument("--profile-stage", choices=[name for name, _, _ in STAGES],
+                        help="只分析指定阶段，默认分析整个运行")
+    parser.add_argument("--trace-memory", action="store_true", help="用tracemalloc输出内存分配Top-N报告")
+    parser.add_argument("--profile-dir", default=".", help="分析结果输出目录，默认当前目录")
+    parser.add_argument("--profile-top", type=int, default=20, help="内存分配报告条数")
+    args = parser.parse_args()
+    if args.profile_stage and not args.profile and not args.trace_memory:
+        parser.error("--profile-stage 需要同时指定 --profile 或 --trace-memory")
+    return args
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    # 启动时校验配置，配置错误立即退出，而不是运行到一半才失败
+    try:
+        run_config = load_config(args.config, args.instance)
+    except ConfigError as e:
+        print(f"配置错误: {e}")
+        sys.exit(2)
+    missing = run_config.missing_paths(["emulator.adb_path", "emulator.ldplayer_path"])
+    if missing:
+        for name, path in missing:
+            print(f"配置错误: {name} 指向的文件不存在: {path}")
+        sys.exit(2)
+    print(f"使用配置档: {run_config.instance}")
+    main(config=run_config, profiler=RunProfiler(mode=args.profile, stage=args.profile_stage, trace_memory=args.trace_memory,
+                     output_dir=args.profile_dir, top_n=args.profile_top))
@@ -1,3 +1,4 @@
+import argparse
 import subprocess
 import datetime
 import time
@@ -6,10 +7,13 @@ import sys
 import io
 from chardet import detect  # 需要安装chardet库：pip install chardet
 
-# 配置路径（根据实际情况修改）
-CONDA_PYTHON_PATH = r"D:\APP\conda\python.exe"  # 指定的Python解释器路径
-TARGET_SCRIPT_PATH = r"E:\Code\pythonProject\pythonProject\签到脚本\签到脚本V1.py"  # 签到脚本路径
-LOG_PATH = r"E:\Code\pythonProject\pythonProject\签到脚本\log.txt"  # 日志文件路径
+from checkpoint import STAGE_NAMES
+from config import DEFAULT_CONFIG_PATH, ConfigError, ConfigWatcher
+
+RELOAD_CHECK_INTERVAL = 60  # 等待期间检查配置文件变化的间隔（秒）
+
+# 当前生效的配置监视器，启动时加载，定时循环中热加载（路径、运行时间等见config.json的runner部分）
+watcher = None
 
 
 def write_log(content, is_console=True):
@@ -18,7 +22,7 @@ def write_log(content, is_console=True):
     if is_console:
         print(content)
     # 日志文件写入（追加模式，utf-8编码）
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
+    with open(watcher.config.runner.log_path, "a", encoding="utf-8") as f:
         f.write(content + "\n")
 
 
@@ -28,8 +32,11 @@ def detect_encoding(byte_data):
     return result['encoding'] or 'utf-8'  # 默认使用utf-8
 
 
-def run_sign_script():
-    """运行签到脚本并记录日志"""
+def run_sign_script(extra_args=()):
+    """运行签到脚本并记录日志
+
+    :param extra_args: 传给签到脚本的额外命令行参数（如性能分析开关）
+    """
     # 记录开始时间（精确到毫秒）
     start_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
     start_line = f"===================== 开始运行：{start_time} ====================="
@@ -38,13 +45,16 @@ def run_sign_script():
     # 提示信息
     write_log("正在使用指定Python环境运行签到脚本...")
 
+    runner = watcher.config.runner
     try:
         # 调用指定Python解释器运行签到脚本，捕获输出和错误（先获取字节数据）
+        # 签到脚本每次运行都重新读取同一配置档，修改配置后下一次运行即生效
         result = subprocess.run(
-            [CONDA_PYTHON_PATH, TARGET_SCRIPT_PATH],
+            [runner.python_path, runner.target_script,
+             "--config", os.path.abspath(watcher.path), "--instance", watcher.config.instance] + list(extra_args),
             stdout=subprocess.PIPE,  # 捕获标准输出
             stderr=subprocess.STDOUT,  # 合并标准错误到标准输出
-            timeout=3600  # 超时时间（1小时，可根据脚本实际运行时间调整）
+            timeout=runner.script_timeout  # 超时时间（可在配置中按脚本实际运行时间调整）
         )
 
         # 检测输出编码并解码
@@ -67,7 +77,7 @@ def run_sign_script():
 
     except subprocess.TimeoutExpired:
         # 处理超时
-        error_msg = "\n错误：签到脚本运行超时（超过1小时）"
+        error_msg = f"\n错误：签到脚本运行超时（超过{runner.script_timeout:.0f}秒）"
         write_log(error_msg)
     except Exception as e:
         # 处理其他异常（如脚本不存在、Python路径错误等）
@@ -82,18 +92,48 @@ def run_sign_script():
     write_log("")
 
 
-def schedule_daily_run():
-    """定时任务：每天4点15分运行签到脚本，主程序持续运行"""
-    write_log("定时任务已启动，将每天4点15分自动运行签到脚本（主程序将持续运行）...\n")
+def next_run_time(now):
+    """按配置的运行时间计算下一次运行时刻"""
+    hour, minute = watcher.config.runner.schedule_time
+    target_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if now > target_time:
+        target_time += datetime.timedelta(days=1)
+    return target_time
+
+
+def wait_until(target_time):
+    """等待到目标时间，期间定期热加载配置
+
+    Returns:
+        True表示到达目标时间，False表示运行时间配置已变化需要重新计算
+    """
+    schedule = watcher.config.runner.schedule
+    while True:
+        remaining = (target_time - datetime.datetime.now()).total_seconds()
+        if remaining <= 0:
+            return True
+        time.sleep(min(remaining, RELOAD_CHECK_INTERVAL))
+        try:
+            reloaded = watcher.reload_if_changed()
+        except ConfigError as e:
+            write_log(f"配置重新加载失败，继续使用原配置: {e}")
+            continue
+        if reloaded:
+            write_log(f"配置已重新加载（配置档：{watcher.config.instance}）")
+            if watcher.config.runner.schedule != schedule:
+                write_log(f"运行时间已从 {schedule} 改为 {watcher.config.runner.schedule}")
+                return False
+
+
+def schedule_daily_run(args):
+    """定时任务：每天按配置的时间（默认4点15分）运行签到脚本，主程序持续运行"""
+    write_log(f"定时任务已启动，将每天{watcher.config.runner.schedule}自动运行签到脚本（主程序将持续运行）...\n")
 
     while True:
         # 获取当前时间
         now = datetime.datetime.now()
-        # 计算"今天4点15分"的时间对象
-        target_time = now.replace(hour=4, minute=15, second=0, microsecond=0)
-
-        if now > target_time:
-            target_time += datetime.timedelta(days=1)
+        # 计算下一次运行时刻
+        target_time = next_run_time(now)
 
         # 计算需要等待的秒数
         wait_seconds = (target_time - now).total_seconds()
@@ -102,14 +142,59 @@ def schedule_daily_run():
         write_log(
             f"下次运行时间：{next_run_str}，将等待 {int(wait_seconds // 3600)}小时{int((wait_seconds % 3600) // 60)}分钟...")
 
-        # 等待到目标时间（阻塞当前进程，不消耗过多资源）
-        time.sleep(wait_seconds)
+        # 等待到目标时间（分段休眠，期间热加载配置；运行时间变化时重新计算）
+        if not wait_until(target_time):
+            continue
 
         # 到点后执行签到脚本
         write_log(f"\n====== 到达指定时间 {next_run_str}，开始执行签到脚本 ======")
-        run_sign_script()
+        # 每次运行时按当前（可能已热加载的）配置生成参数
+        run_sign_script(profile_args(args))
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="每天定时运行签到脚本")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="配置文件路径，默认为脚本目录下的config.json")
+    parser.add_argument("--instance", help="使用的配置档，默认为配置文件中的active_profile")
+    parser.add_argument("--once", action="store_true", help="立即运行一次签到脚本后退出")
+    parser.add_argument("--profile", choices=["cprofile", "sample"], help="让签到脚本开启性能分析")
+    parser.add_argument("--profile-stage", choices=STAGE_NAMES, help="只分析指定阶段，默认分析整个运行")
+    parser.add_argument("--trace-memory", action="store_true", help="让签到脚本输出内存分配Top-N报告")
+    args = parser.parse_args()
+    # 在启动时报错，而不是等到凌晨运行签到脚本时才失败或被忽略
+    if args.profile_stage and not args.profile and not args.trace_memory:
+        parser.error("--profile-stage 需要同时指定 --profile 或 --trace-memory")
+    return args
+
+
+def profile_args(args):
+    """把性能分析开关转换为签到脚本参数，结果写到日志文件所在目录"""
+    if not args.profile and not args.trace_memory:
+        return []
+    # 日志路径可以是相对路径（如log.txt），先转为绝对路径，否则目录为空字符串
+    extra_args = ["--profile-dir", os.path.dirname(os.path.abspath(watcher.config.runner.log_path))]
+    if args.profile:
+        extra_args += ["--profile", args.profile]
+    if args.profile_stage:
+        extra_args += ["--profile-stage", args.profile_stage]
+    if args.trace_memory:
+        extra_args.append("--trace-memory")
+    return extra_args
 
 
 if __name__ == "__main__":
-    # 启动定时任务（程序将一直运行，除非手动关闭）
-    schedule_daily_run()
+    args = parse_args()
+    # 启动时校验配置，配置错误立即退出，不会等到凌晨运行时才发现
+    # 路径检查在热加载时同样执行，修改后的路径不存在时继续使用原配置
+    try:
+        watcher = ConfigWatcher(args.config, args.instance,
+                                required_paths=["runner.python_path", "runner.target_script"])
+    except ConfigError as e:
+        print(f"配置错误: {e}")
+        sys.exit(2)
+    if args.once:
+        run_sign_script(profile_args(args))
+    else:
+        # 启动定时任务（程序将一直运行，除非手动关闭）
+        schedule_daily_run(args)